@@ -1,7 +1,20 @@
 import streamlit as st
 import pandas as pd
-import requests
+import queue
+import functools
 from datetime import datetime, timedelta
+import http_pool
+from backend import SheetsBackend, LocalBackend
+from local_store import LocalStore, LOCAL_PATH
+from writer import WriteQueue, QUEUED, DONE, FAILED, RETRYING
+from ingest import UNUSED, ROW_KEY
+from portfolio import reconcile, build_stock_index
+from positions import PositionEngine
+from broker_import import NEW, read_statement, to_trades, dedupe, trade_payloads, chunks
+from history import build_history, history_until
+from views import (PAGE_SIZE, holdings_frame, holdings_styler, trans_styler, div_styler,
+                   holdings_view, trans_view, div_view, page_of, table_key, selected_rows)
+from metrics import MetricsStore, RunMetrics
 
 # ==========================================
 # 0. 登入系統 (門神)
@@ -34,53 +47,162 @@ if not check_password():
 # ==========================================
 # 1. 設定區
 # ==========================================
-try:
-    DASHBOARD_URL = st.secrets["public_sheet_url"]
-    TRANS_URL = st.secrets["trans_sheet_url"]
-    MSG_URL = st.secrets["msg_sheet_url"]
-    ACT_URL = st.secrets["act_sheet_url"]
-    GAS_URL = st.secrets["gas_url"]
-    STOCK_MAP_URL = st.secrets["stock_map_url"]
-    DIV_URL = st.secrets["div_sheet_url"]
-    FUND_URL = st.secrets["fund_sheet_url"]  
-except (FileNotFoundError, KeyError) as e:
-    st.error(f"🔒 錯誤：找不到 Secrets 設定！請檢查 Streamlit Cloud 後台。\n缺少項目: {e}")
-    st.stop()
+# 各表對應的 Secrets 名稱
+SHEET_SECRETS = {"stock_map": "stock_map_url", "msg": "msg_sheet_url", "dash": "public_sheet_url", "trans": "trans_sheet_url",
+                 "div": "div_sheet_url", "fund": "fund_sheet_url", "act": "act_sheet_url"}
+
+# 本機資料庫整個程序共用一份 (記憶體快取與寫入鎖都在裡面)
+@st.cache_resource
+def get_local_store(path):
+    return LocalStore(path)
+
+# secrets 設 backend = "local" 時改用本機 SQLite (路徑為 local_db)，不需要 Google Sheet 與 Apps Script
+if st.secrets.get("backend", "sheets") == "local":
+    backend = LocalBackend(get_local_store(st.secrets.get("local_db", LOCAL_PATH)))
+else:
+    try:
+        backend = SheetsBackend({name: st.secrets[key] for name, key in SHEET_SECRETS.items()}, st.secrets["gas_url"])
+    except (FileNotFoundError, KeyError) as e:
+        st.error(f"🔒 錯誤：找不到 Secrets 設定！請檢查 Streamlit Cloud 後台。\n缺少項目: {e}")
+        st.stop()
+
+# 每種寫入動作會動到哪些表：寫入後只讓這幾張表重新讀取
+WRITE_TARGETS = {
+    "msg": ["msg"],
+    "fund": ["fund", "act"],
+    "trade": ["trans", "dash", "act"],
+    "import_trades": ["trans", "dash", "act"],
+    "dividend": ["div", "act"],
+    "update_stock": ["stock_map"],
+    "update_div_status": ["div"],
+    "update_div_status_bulk": ["div"],
+}
+# 股利狀態一次改多筆要 Apps Script 支援 update_div_status_bulk，secrets 設 gas_div_bulk = true 才使用；
+# 否則每筆各送一個原本的 update_div_status (本機資料庫一律用批次)
+DIV_BULK = backend.transport is not None or st.secrets.get("gas_div_bulk", False)
+# 對帳單匯入同理：Apps Script 支援 import_trades 時設 gas_import_trades = true，一次送一批；
+# 否則每筆各送一個原本的 trade (gas_batch 仍可把同時排隊的幾筆包成一個請求)
+IMPORT_BULK = backend.transport is not None or st.secrets.get("gas_import_trades", False)
 
 # ==========================================
 # 2. 資料處理函數
 # ==========================================
-@st.cache_data(ttl=60)
-def load_data(url):
-    try:
-        df = pd.read_csv(url, dtype={'股票代號': str})
-        return df
-    except Exception as e:
-        return None
-
-@st.cache_data(ttl=60)
-def load_stock_map():
+def build_stock_map(df):
     try:
-        df = pd.read_csv(STOCK_MAP_URL, dtype=str)
-        if '股票代號' in df.columns and '股票名稱' in df.columns:
-            df['股票代號'] = df['股票代號'].str.strip()
-            df['股票名稱'] = df['股票名稱'].str.strip()
+        if df is not None and '股票代號' in df.columns and '股票名稱' in df.columns:
             return dict(zip(df['股票代號'], df['股票名稱']))
         return {}
     except:
         return {}
 
-stock_map_dict = load_stock_map()
-
-def clean_stock_code(series):
-    return (series.astype(str).str.replace(r'\.0$', '', regex=True).str.strip().str.zfill(4))
-
-def clean_number(x):
-    if pd.isna(x) or str(x).strip() in ["#N/A", "-", "nan", ""]: return 0
+# 表格呈現：預設用 column_config 快速模式；secrets 設 table_render = "styler" 可改回彩色 Styler
+FAST_TABLES = st.secrets.get("table_render", "fast") != "styler"
+
+def show_table(df, view, styler, **kwargs):
+    if FAST_TABLES:
+        df, config = view(df)
+        return st.dataframe(df, column_config=config, use_container_width=True, hide_index=True, **kwargs)
+    return st.dataframe(styler(df), use_container_width=True, hide_index=True, **kwargs)
+
+def paged(df, key):
+    """明細超過一頁時加上頁碼 (預設最後一頁，也就是最新的紀錄)。"""
+    pages = -(-len(df) // PAGE_SIZE)
+    if pages <= 1: return df
+    page = st.number_input(f"頁數 (共 {pages} 頁，每頁 {PAGE_SIZE} 筆)", min_value=1, max_value=pages, value=pages, key=key)
+    return page_of(df, page)
+
+http_pool.configure(pool_size=int(st.secrets.get("http_pool_size", http_pool.POOL_SIZE)),
+                    connect_timeout=float(st.secrets.get("http_connect_timeout", http_pool.CONNECT_TIMEOUT)),
+                    read_timeout=float(st.secrets.get("http_read_timeout", http_pool.READ_TIMEOUT)))
+
+# 效能紀錄：每次 rerun 各階段耗時，後台可看最近幾次的 p50 / p95
+@st.cache_resource
+def get_metrics():
+    return MetricsStore(log_path=st.secrets.get("metrics_log"))
+
+run = RunMetrics()
+
+def timed_fragment(name):
+    """包成 fragment 並計時：整頁執行時記在本次 rerun，單獨重跑時另記一筆 fragment 紀錄。"""
+    def wrap(func):
+        @st.fragment
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            current = run if run.total is None else RunMetrics(fragment=name)
+            with current.stage(name):
+                func(*args, **kwargs)
+            if current is not run: get_metrics().add(current.finish())
+        return inner
+    return wrap
+
+# 一次併發抓取所有表：冷啟動只需等最慢的那一張
+with run.stage("讀取表格"):
+    sheets = backend.load(stats=run.sheets)
+stock_map_dict = build_stock_map(sheets["stock_map"])
+
+# 寫入改由背景佇列送出 (Apps Script 或本機資料庫)，成功後才讓相關的表重新讀取
+# 舊版 Apps Script 只回純文字時，secrets 設 gas_plain_text = true 才會把非 JSON 回應當成成功
+# Apps Script 已依 idempotency_key 去重時，設 gas_idempotent = true，讀取逾時與 5xx 才會自動重送
+@st.cache_resource
+def get_write_queue():
+    return WriteQueue(backend.url, batch=st.secrets.get("gas_batch", False), transport=backend.transport,
+                      plain_text=st.secrets.get("gas_plain_text", False),
+                      idempotent=st.secrets.get("gas_idempotent", False),
+                      on_success=lambda job: backend.invalidate(job.invalidate))
+
+# 持股引擎：增量重播交易表，檢查點跨 rerun / 重開機保留
+@st.cache_resource
+def get_position_engine():
+    return PositionEngine()
+
+def queue_write(payload, label):
     try:
-        return float(str(x).replace(',', '').replace('$', ''))
-    except:
-        return 0
+        job = get_write_queue().submit(payload, label, invalidate=WRITE_TARGETS[payload["action"]])
+    except queue.Full:
+        st.error("❌ 寫入佇列已滿，請稍後再試")
+        return None
+    st.session_state.setdefault("write_jobs", []).append(job.id)
+    return job
+
+def write_status_panel():
+    jobs = get_write_queue().jobs(set(st.session_state.get("write_jobs", [])))
+    if not jobs: return
+    pending = [j for j in jobs if not j.finished]
+    done_count = len(jobs) - len(pending)
+
+    @st.fragment(run_every=2 if pending else None)
+    def panel():
+        now_jobs = get_write_queue().jobs({j.id for j in jobs})
+        now_done = sum(j.finished for j in now_jobs)
+        with st.expander(f"📮 寫入狀態 (處理中 {len(now_jobs) - now_done} 筆)", expanded=bool(pending)):
+            for j in reversed(now_jobs[-10:]):
+                icon = {DONE: "✅", FAILED: "❌", RETRYING: "🔁"}.get(j.status, "⏳")
+                note = f" — {j.message}" if j.message and (j.status != DONE or j.failed_rows) else ""
+                st.caption(f"{icon} {j.label}：{j.status} (第 {j.attempts} 次){note}")
+        if now_done > done_count and now_done == len(now_jobs):
+            st.rerun()  # 全部寫入都處理完 → 整頁重跑一次，讀取更新後的表 (逐筆送出的匯入不會每筆都重跑)
+
+    panel()
+
+def describe_age(seconds):
+    if seconds is None: return "尚未讀取"
+    if seconds < 60: return f"{seconds:.0f} 秒前"
+    if seconds < 3600: return f"{seconds // 60:.0f} 分鐘前"
+    return f"{seconds // 3600:.0f} 小時前"
+
+def data_status():
+    """顯示資料新舊；背景更新進行中時每秒檢查一次，完成後有表的內容變了才整頁重跑換上新資料。"""
+    busy, version = backend.refreshing(), backend.version()
+
+    @st.fragment(run_every=1 if busy else None)
+    def status():
+        still_busy = backend.refreshing()
+        note = " · 🔄 背景更新中…" if still_busy else ""
+        st.caption(f"🕒 資料更新於 {describe_age(backend.age())}{note}")
+        if busy and not still_busy and backend.version() != version:
+            st.rerun()
+
+    status()
 
 # ==========================================
 # 3. 網頁主程式 (★ PWA 沉浸式 App 畫面改造 ★)
@@ -107,158 +229,86 @@ with col_title:
     st.title("💰 存股儀表板")
 with col_btn:
     st.markdown('<div style="margin-top: 20px;"></div>', unsafe_allow_html=True)
-    if st.button('🔄 更新', help="強制重新讀取 Google Sheet"):
-        st.cache_data.clear()
-        st.rerun()
+    if st.button('🔄 更新', help="在背景重新讀取 Google Sheet，完成後自動換上新資料"):
+        backend.refresh()
+        st.toast("🔄 背景更新中…")
+
+data_status()
+write_status_panel()
 
+# 以下各區塊都是 fragment：區塊內的互動 (點選持股、展開、表單) 只重跑該區塊，不會重新讀表與對帳
 # --- A. 智慧公告欄 ---
-df_msg = load_data(MSG_URL)
-if df_msg is not None and not df_msg.empty:
-    try:
-        df_msg.columns = df_msg.columns.str.strip()
-        if '日期' in df_msg.columns:
-            df_msg['日期'] = pd.to_datetime(df_msg['日期'], errors='coerce')
-        df_reversed = df_msg.iloc[::-1].reset_index(drop=True)
-        if not df_reversed.empty:
-            latest = df_reversed.iloc[0]
-            l_type = latest['類型'] if '類型' in df_reversed.columns else '一般'
-            l_icon, alert_func = "📢", st.info
-            if '慶祝' in str(l_type): l_icon, alert_func = "🎉", st.success
-            elif '提醒' in str(l_type): l_icon, alert_func = "🔔", st.warning
-            elif '緊急' in str(l_type): l_icon, alert_func = "🚨", st.error
-            l_date_str = latest['日期'].strftime('%Y-%m-%d') if pd.notna(latest['日期']) else ""
-            with st.container():
-                alert_func(f"**{l_date_str}**：{latest['內容']}", icon=l_icon)
-            if len(df_reversed) > 1:
-                with st.expander("📜 查看近期公告"):
-                    for index, row in df_reversed.iloc[1:6].iterrows():
-                        d_str = row['日期'].strftime('%Y-%m-%d') if pd.notna(row['日期']) else ""
-                        st.write(f"• **{d_str}** ({row.get('類型','-')})：{row['內容']}")
-    except Exception as e: pass
-
-with st.expander("📝 發布新公告 "):
-    with st.form("public_msg_form"):
-        c1, c2 = st.columns([1, 3])
-        nt = c1.selectbox("類型", ["🎉 慶祝", "🔔 提醒", "📢 一般", "🚨 緊急"])
-        nc = c2.text_input("內容", placeholder="想在看板上說些什麼呢？")
-        if st.form_submit_button("送出公告"):
-            if nc.strip():
-                requests.post(GAS_URL, json={"action": "msg", "date": datetime.now().strftime("%Y-%m-%d"), "type": nt, "content": nc})
-                st.toast("✅ 公告已發布！")
-                st.cache_data.clear()
-                st.rerun()
-            else:
-                st.warning("請輸入公告內容喔！")
+@timed_fragment("公告欄")
+def notice_board(df_msg):
+    if df_msg is not None and not df_msg.empty:
+        try:
+            df_reversed = df_msg.iloc[::-1].reset_index(drop=True)
+            if not df_reversed.empty:
+                latest = df_reversed.iloc[0]
+                l_type = latest['類型'] if '類型' in df_reversed.columns else '一般'
+                l_icon, alert_func = "📢", st.info
+                if '慶祝' in str(l_type): l_icon, alert_func = "🎉", st.success
+                elif '提醒' in str(l_type): l_icon, alert_func = "🔔", st.warning
+                elif '緊急' in str(l_type): l_icon, alert_func = "🚨", st.error
+                l_date_str = latest['日期'].strftime('%Y-%m-%d') if pd.notna(latest['日期']) else ""
+                with st.container():
+                    alert_func(f"**{l_date_str}**：{latest['內容']}", icon=l_icon)
+                if len(df_reversed) > 1:
+                    with st.expander("📜 查看近期公告"):
+                        for index, row in df_reversed.iloc[1:6].iterrows():
+                            d_str = row['日期'].strftime('%Y-%m-%d') if pd.notna(row['日期']) else ""
+                            st.write(f"• **{d_str}** ({row.get('類型','-')})：{row['內容']}")
+        except Exception as e: pass
+
+    with st.expander("📝 發布新公告 "):
+        with st.form("public_msg_form"):
+            c1, c2 = st.columns([1, 3])
+            nt = c1.selectbox("類型", ["🎉 慶祝", "🔔 提醒", "📢 一般", "🚨 緊急"])
+            nc = c2.text_input("內容", placeholder="想在看板上說些什麼呢？")
+            if st.form_submit_button("送出公告"):
+                if nc.strip():
+                    if queue_write({"action": "msg", "date": datetime.now().strftime("%Y-%m-%d"), "type": nt, "content": nc}, f"公告：{nc}"):
+                        st.toast("📮 公告送出中…")
+                        st.rerun()
+                else:
+                    st.warning("請輸入公告內容喔！")
 
 # --- B. 儀表板核心數據 (5大看板 + 算法B: 真實本金對帳) ---
-df_dash = load_data(DASHBOARD_URL)
-df_trans = load_data(TRANS_URL)
-df_div = load_data(DIV_URL)
-df_fund = load_data(FUND_URL)
-
-# 1. 資金進出總計
-total_fund_in = 0
-if df_fund is not None and not df_fund.empty:
-    df_fund.columns = df_fund.columns.str.strip()
-    if '金額' in df_fund.columns:
-        df_fund_clean = df_fund[df_fund['姓名'].astype(str).str.strip().isin(['建蒼', '奕州'])]
-        total_fund_in = df_fund_clean['金額'].apply(clean_number).sum()
-
-# 2. 交易計算 (真實現金流與再投入)
-reinvest_dict = {}
-total_cash_out = 0
-total_cash_rev = 0
-if df_trans is not None and not df_trans.empty:
-    df_trans_clean = df_trans.copy()
-    df_trans_clean.columns = df_trans_clean.columns.str.strip()
-    if '股票代號' in df_trans_clean.columns and '股息再投入' in df_trans_clean.columns and '投入金額' in df_trans_clean.columns and '交易類別' in df_trans_clean.columns:
-        df_trans_clean['股票代號'] = clean_stock_code(df_trans_clean['股票代號'])
-        df_trans_clean['投入金額'] = df_trans_clean['投入金額'].apply(clean_number)
-        
-        mask_reinvest = df_trans_clean['股息再投入'].astype(str).str.strip().isin(['Y', '✅', '✔️'])
-        is_buy = df_trans_clean['交易類別'].astype(str).str.strip() == '買入'
-        is_sell = df_trans_clean['交易類別'].astype(str).str.strip() == '賣出'
-        
-        reinvest_dict = df_trans_clean[mask_reinvest & is_buy].groupby('股票代號')['投入金額'].sum().to_dict()
-        total_cash_out = df_trans_clean[is_buy & (~mask_reinvest)]['投入金額'].sum()
-        total_cash_rev = df_trans_clean[is_sell]['投入金額'].sum()
-
-# 3. 股利計算
-total_div_all = 0
-remaining_div = 0
-df_div_grouped = pd.DataFrame()
-
-if df_div is not None and not df_div.empty:
-    df_div.columns = df_div.columns.str.strip()
-    if '股票代號' in df_div.columns and '實領金額' in df_div.columns:
-        df_div_clean = df_div[~df_div['股票代號'].astype(str).str.contains('計|Total', na=False)].copy()
-        
-        if not df_div_clean.empty:
-            df_div_clean['股票代號'] = clean_stock_code(df_div_clean['股票代號'])
-            df_div_clean['實領金額'] = df_div_clean['實領金額'].apply(clean_number)
-            
-            total_div_all = df_div_clean['實領金額'].sum()
-            if '狀態' in df_div_clean.columns:
-                df_div_clean['狀態'] = df_div_clean['狀態'].fillna("未使用")
-                remaining_div = df_div_clean[df_div_clean['狀態'] == '未使用']['實領金額'].sum()
-                
-            df_div_grouped = df_div_clean.groupby('股票代號')['實領金額'].sum().reset_index()
-            df_div_grouped.rename(columns={'實領金額': '已領股息'}, inplace=True)
-
-# 4. 統整持股清單與大數據
-if df_dash is not None and not df_dash.empty:
-    try:
-        df_dash = df_dash.astype(str)
-        df_stocks = df_dash[~df_dash["股票代號"].str.contains("計|Total", na=False)].copy()
-        df_stocks["股票代號"] = clean_stock_code(df_stocks["股票代號"])
-        for col in ["總投入本金", "目前市值", "帳面損益", "累積總股數", "平均成本", "目前股價"]:
-            if col in df_stocks.columns: df_stocks[col] = df_stocks[col].apply(clean_number).fillna(0)
-        df_stocks = df_stocks[df_stocks["累積總股數"] > 0].copy()
-        
-        mask_missing = (df_stocks["目前市值"] == 0) & (df_stocks["總投入本金"] > 0)
-        df_stocks.loc[mask_missing, "目前市值"] = df_stocks.loc[mask_missing, "總投入本金"]
-        
-        df_stocks['再投入金額'] = df_stocks['股票代號'].map(reinvest_dict).fillna(0)
-        df_stocks['總投入本金'] = df_stocks['總投入本金'] - df_stocks['再投入金額']
-        df_stocks['總投入本金'] = df_stocks['總投入本金'].apply(lambda x: max(x, 0)) 
-        
-        df_stocks['帳面損益'] = df_stocks['目前市值'] - df_stocks['總投入本金']
-        
-        total_cost = df_stocks["總投入本金"].sum()
-        total_value = df_stocks["目前市值"].sum()
-        total_profit = total_value - total_cost
-        
-        if not df_div_grouped.empty:
-            df_stocks = pd.merge(df_stocks, df_div_grouped, on='股票代號', how='left')
-        df_stocks['已領股息'] = df_stocks.get('已領股息', pd.Series(0, index=df_stocks.index)).fillna(0)
-
-        df_stocks['含息報酬率'] = 0.0
-        mask_cost = df_stocks['總投入本金'] > 0
-        df_stocks.loc[mask_cost, '含息報酬率'] = ((df_stocks['目前市值'] + df_stocks['已領股息'] - df_stocks['總投入本金']) / df_stocks['總投入本金']) * 100
-        
-        available_cash = total_fund_in - total_cash_out + total_cash_rev + remaining_div
-        
-        # --- 繪製 5 大核心數據 ---
-        col1, col2, col3, col4, col5 = st.columns(5)
-        col1.metric("真實投入本金", f"${total_cost:,.0f}")
-        col2.metric("目前總市值", f"${total_value:,.0f}", delta=f"{total_profit:,.0f} 元 (帳面損益)", delta_color="inverse")
-        col3.metric("🏦 可用現金餘額", f"${available_cash:,.0f}", help="總入金 - 現金買入花費 + 賣出收入 + 閒置股息")
-        col4.metric("💰 累積已領股息", f"${total_div_all:,.0f}", delta=f"剩餘可用: ${remaining_div:,.0f}", delta_color="off")
-        
-        total_profit_with_div = total_profit + total_div_all
-        roi_with_div = (total_profit_with_div / total_cost * 100) if total_cost > 0 else 0
-        col5.metric("📈 含息總報酬率", f"{roi_with_div:.2f}%", delta=f"{total_profit_with_div:,.0f} 元 (真實獲利)", delta_color="inverse")
-        
-        st.caption("💡 註：系統已自動根據資金表與交易表對帳，呈現證券帳戶「真實可用餘額」與「投入成本」。")
-        st.divider()
-
-        # --- C. 最新動態 ---
-        st.subheader("⚡最新動態")
-        df_act = load_data(ACT_URL)
+@timed_fragment("核心數據")
+def kpi_row(recon, df_trans, df_div, df_fund):
+    total_cost, total_value, total_profit = recon.total_cost, recon.total_value, recon.total_profit
+    available_cash, total_div_all, remaining_div = recon.available_cash, recon.total_div_all, recon.remaining_div
+
+    # --- 繪製 5 大核心數據 ---
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("真實投入本金", f"${total_cost:,.0f}")
+    col2.metric("目前總市值", f"${total_value:,.0f}", delta=f"{total_profit:,.0f} 元 (帳面損益)", delta_color="inverse")
+    col3.metric("🏦 可用現金餘額", f"${available_cash:,.0f}", help="總入金 - 現金買入花費 + 賣出收入 + 閒置股息")
+    col4.metric("💰 累積已領股息", f"${total_div_all:,.0f}", delta=f"剩餘可用: ${remaining_div:,.0f}", delta_color="off")
+
+    col5.metric("📈 含息總報酬率", f"{recon.roi_with_div:.2f}%", delta=f"{total_profit + total_div_all:,.0f} 元 (真實獲利)", delta_color="inverse")
+
+    st.caption("💡 註：系統已自動根據資金表與交易表對帳，呈現證券帳戶「真實可用餘額」與「投入成本」。")
+    if pd.notna(recon.xirr):
+        st.caption(f"📅 年化報酬率 (XIRR)：**{recon.xirr:.2f}%**　依每筆買賣、股利的日期計算，長期定期定額的持股也能互相比較")
+
+    history_box = st.expander("📈 資產走勢", key="history_open", on_change="rerun")
+    if history_box.open:  # 展開時才計算
+        with history_box:
+            df_history = history_until(build_history(df_trans, df_div, df_fund), pd.Timestamp.now().normalize(), latest_value=total_value)
+            if not df_history.empty:
+                st.line_chart(df_history)
+                st.caption("歷史市值以各股最近一次成交單價估算，最後一天為目前市值；投入本金 = 現金買入 − 賣出收入。")
+            else: st.caption("尚無可繪製的紀錄")
+
+# --- C. 最新動態 ---
+@timed_fragment("最新動態")
+def activity_feed(df_act):
+    feed_box = st.expander("⚡最新動態", key="feed_open", on_change="rerun")
+    if not feed_box.open: return  # 展開時才整理、逐筆畫出
+    with feed_box:
         if df_act is not None and not df_act.empty:
             try:
-                df_act.columns = df_act.columns.str.strip()
-                if '日期' in df_act.columns: df_act['日期'] = pd.to_datetime(df_act['日期'], errors='coerce')
                 cutoff_date = datetime.now() - timedelta(days=30)
                 df_recent = df_act[df_act['日期'] >= cutoff_date].sort_values(by='日期', ascending=False).reset_index(drop=True)
                 if not df_recent.empty:
@@ -273,31 +323,18 @@ if df_dash is not None and not df_dash.empty:
                 else: st.caption("近一個月無動態")
             except: st.caption("尚無動態")
         else: st.caption("尚無動態資料")
-        st.divider()
 
-        # --- D. 持股清單 ---
+# --- D. 持股清單 ---
+@timed_fragment("持股清單")
+def holdings(df_stocks, positions, stock_index, df_div):
+    try:
         st.subheader("📋 持股清單")
-        display_df = df_stocks[["股票代號", "目前市值", "帳面損益", "已領股息", "含息報酬率", "總投入本金", "目前股價", "累積總股數"]].copy()
-        display_df["顯示名稱"] = display_df["股票代號"].map(stock_map_dict).fillna("")
-        display_df["股票代號"] = display_df.apply(lambda x: f"{x['股票代號']} ({x['顯示名稱']})" if x['顯示名稱'] else x['股票代號'], axis=1)
-        display_df = display_df.drop(columns=["顯示名稱"])
-        
-        def style_row(row):
-            color = '#ff2b2b' if row['含息報酬率'] > 0 else '#09ab3b' if row['含息報酬率'] < 0 else 'black'
-            return [f'color: {color}; font-weight: bold' if col in ['帳面損益', '含息報酬率'] else '' for col in row.index]
-
-        event = st.dataframe(
-            display_df.style.format({
-                "總投入本金": "{:,.0f}", 
-                "目前市值": "{:,.0f}", 
-                "帳面損益": "{:,.0f}",
-                "已領股息": "{:,.0f}",
-                "含息報酬率": "{:.2f}%",
-                "目前股價": "{:.2f}", 
-                "累積總股數": "{:,.0f}"
-            }).apply(style_row, axis=1).bar(subset=['含息報酬率'], align='mid', color=['#90EE90', '#FFB6C1']),
-            use_container_width=True, hide_index=True, on_select="rerun", selection_mode="single-row"
-        )
+        display_df = holdings_frame(df_stocks, stock_map_dict, positions)
+        ledger_shares = df_stocks["股票代號"].map(positions["持有股數"])
+        mismatched = df_stocks.loc[ledger_shares.notna() & (ledger_shares != df_stocks["累積總股數"]), "股票代號"].tolist()
+        event = show_table(display_df, holdings_view, holdings_styler, on_select="rerun", selection_mode="single-row")
+        if mismatched:
+            st.caption(f"⚠️ 依交易表重播的股數與儀表板不一致：{'、'.join(mismatched)}")
 
         if len(event.selection.rows) > 0:
             sel_idx = event.selection.rows[0]
@@ -309,70 +346,262 @@ if df_dash is not None and not df_dash.empty:
                 tab_trans, tab_div = st.tabs(["⚖️ 交易明細", "💸 領息紀錄"])
                 
                 with tab_trans:
-                    if df_trans is not None and not df_trans.empty:
-                        df_trans.columns = df_trans.columns.str.strip()
-                        if "股票代號" in df_trans.columns:
-                            df_trans["股票代號"] = clean_stock_code(df_trans["股票代號"])
-                            my_trans = df_trans[df_trans["股票代號"] == sel_code].copy()
-                            if "投入金額" in my_trans.columns:
-                                my_trans = my_trans[my_trans["投入金額"].astype(str).str.strip() != ""]
-                                my_trans = my_trans[my_trans["投入金額"].apply(clean_number) > 0]
-                            if not my_trans.empty:
-                                for col in ["成交單價", "投入金額", "成交股數"]:
-                                    if col in my_trans.columns: my_trans[col] = my_trans[col].apply(clean_number)
-                                
-                                if "日期" in my_trans.columns:
-                                    my_trans = my_trans.sort_values(by="日期", ascending=True)
-
-                                if "定期定額" in my_trans.columns:
-                                    my_trans["定期定額"] = my_trans["定期定額"].apply(lambda x: "✔️" if str(x).strip() in ["Y", "✅", "✔️"] else "❌")
-                                if "股息再投入" in my_trans.columns:
-                                    my_trans["股息再投入"] = my_trans["股息再投入"].apply(lambda x: "✔️" if str(x).strip() in ["Y", "✅", "✔️"] else "❌")
-
-                                cols = ["日期", "交易類別", "成交單價", "投入金額", "成交股數", "定期定額", "股息再投入"]
-                                final = [c for c in cols if c in my_trans.columns]
-                                
-                                def highlight(v): return 'color: #ff2b2b; font-weight: bold' if v=='買入' else 'color: #09ab3b; font-weight: bold' if v=='賣出' else ''
-                                st.dataframe(my_trans[final].style.map(highlight, subset=['交易類別']).format({"成交單價": "{:.2f}", "投入金額": "{:,.0f}", "成交股數": "{:,.0f}"}), use_container_width=True, hide_index=True)
-                            else: st.warning("尚無交易紀錄。")
+                    if stock_index.trans is not None:
+                        my_trans = stock_index.trans.get(sel_code)
+                        if my_trans is not None and not my_trans.empty:
+                            show_table(paged(my_trans, f"trans_page_{sel_code}"), trans_view, trans_styler)
+                        else: st.warning("尚無交易紀錄。")
                 
                 with tab_div:
                     if df_div is not None and not df_div.empty:
-                        df_div.columns = df_div.columns.str.strip()
-                        if "股票代號" in df_div.columns:
-                            df_div["股票代號"] = clean_stock_code(df_div["股票代號"])
-                            my_div = df_div[df_div["股票代號"] == sel_code].copy()
-                            if not my_div.empty:
-                                for col in ["配息單價", "實領金額"]:
-                                    if col in my_div.columns: my_div[col] = my_div[col].apply(clean_number)
+                        if stock_index.div is not None:
+                            my_div = stock_index.div.get(sel_code)
+                            if my_div is not None and not my_div.empty:
                                 total_div = my_div["實領金額"].sum()
                                 st.metric("💰 此檔股票累積領息", f"${total_div:,.0f}")
-
-                                cols = ["發放日期", "季", "配息單價", "實領金額", "狀態"]
-                                final = [c for c in cols if c in my_div.columns]
-                                
-                                if "發放日期" in my_div.columns: 
-                                    my_div = my_div.sort_values(by="發放日期", ascending=True)
-                                
-                                def style_status(v):
-                                    if v == '未使用': return 'background-color: #ffeebb; color: black;'
-                                    if v == '再投入股票': return 'background-color: #ccffcc; color: black;'
-                                    if v == '領出': return 'background-color: #ffcccc; color: black;'
-                                    return ''
-
-                                if "狀態" in final:
-                                    st.dataframe(my_div[final].style.map(style_status, subset=['狀態']).format({"配息單價": "{:.2f}", "實領金額": "{:,.0f}"}), use_container_width=True, hide_index=True)
-                                else:
-                                    st.dataframe(my_div[final].style.format({"配息單價": "{:.2f}", "實領金額": "{:,.0f}"}), use_container_width=True, hide_index=True)
+                                show_table(paged(my_div, f"div_page_{sel_code}"), div_view, div_styler)
                             else: st.info("尚無領息紀錄")
                     else: st.info("尚無股利資料表")
+    except Exception as e: st.error(f"程式錯誤：{e}")
+
+notice_board(sheets["msg"])
+
+df_dash = sheets["dash"]
+df_trans = sheets["trans"]
+df_div = sheets["div"]
+df_fund = sheets["fund"]
+df_stocks = None
+
+if df_dash is not None and not df_dash.empty:
+    try:
+        with run.stage("對帳"):
+            recon = reconcile(df_dash, df_trans, df_div, df_fund, pd.Timestamp.now().normalize())
+        with run.stage("個股索引"):
+            stock_index = build_stock_index(df_trans, df_div)
+        with run.stage("持股引擎"):
+            positions = get_position_engine().update(df_trans).set_index("股票代號")
+        df_stocks = recon.df_stocks
+
+        kpi_row(recon, df_trans, df_div, df_fund)
+        st.divider()
+        activity_feed(sheets["act"])
+        st.divider()
+        holdings(df_stocks, positions, stock_index, df_div)
 
     except Exception as e: st.error(f"程式錯誤：{e}")
 else: st.error("讀取失敗，請檢查 Secrets 設定。")
 
+get_metrics().add(run.finish())
+
 # ==========================================
 # 4. 管理員專區
 # ==========================================
+# 每個分頁各自是 fragment：填表、切換選項只重跑該分頁
+@st.fragment
+def stock_tab():
+    with st.form("stock_form"):
+        c1, c2 = st.columns(2)
+        mc = c1.text_input("代號", placeholder="0050").strip()
+        mn = c2.text_input("名稱", placeholder="元大台灣50").strip()
+        if st.form_submit_button("儲存"):
+            if queue_write({"action": "update_stock", "stock": mc, "name": mn}, f"股票：{mc} ➝ {mn}"):
+                st.toast(f"📮 更新中：{mc} ➝ {mn}"); st.rerun()
+    if stock_map_dict:
+        df_map = pd.DataFrame(list(stock_map_dict.items()), columns=['代號', '名稱']).sort_values('代號')
+        st.dataframe(df_map, use_container_width=True, hide_index=True)
+
+@st.fragment
+def fund_tab():
+    st.info("紀錄匯入或匯出證券交割戶的款項 (出金請輸入負數)")
+    with st.form("fund_form"):
+        c1, c2, c3 = st.columns(3)
+        fd = c1.date_input("日期", datetime.now())
+        fn = c2.selectbox("姓名", ["建蒼", "奕州"])
+        fa = c3.number_input("金額 (出金請輸入負數)", step=1000, value=0)
+        fnt = st.text_input("備註")
+        if st.form_submit_button("入帳"):
+            if queue_write({"action": "fund", "date": fd.strftime("%Y-%m-%d"), "name": fn, "amount": fa, "note": fnt}, f"資金：{fn} {fa:,}"):
+                st.toast("📮 入帳送出中…"); st.rerun()
+
+@st.fragment
+def trade_tab():
+    st.info("💡 **【股票分割 / 配股操作指南】**\n1. 類別選「股票分割 (配股)」\n2. 單價輸入 0\n3. 股數輸入「額外多拿到」的數量")
+    with st.form("trade_form"):
+        c1, c2 = st.columns(2)
+        td = c1.date_input("日期", datetime.now())
+        opts = [f"{k} ({v})" for k, v in stock_map_dict.items()] if stock_map_dict else ["0050", "006208"]
+        sel = c1.selectbox("代號", opts + ["🖊️ 自行輸入"])
+        ts = c1.text_input("輸入代號").strip() if sel == "🖊️ 自行輸入" else sel.split(" ")[0]
+        tt = c1.selectbox("類別", ["買入", "賣出", "股票分割 (配股)"])
+        ir = c1.checkbox("定期定額", True)
+        id = c1.checkbox("股息再投入", False)
+        tp = c2.number_input("單價", step=0.1, format="%.2f", value=0.0)
+        tsh = c2.number_input("股數", step=100)
+        tf = c2.number_input("手續費", value=20)
+        if st.form_submit_button("記錄"):
+            tot = int(tp * tsh)
+            mark_reg = "✔️" if ir else "❌"
+            mark_div = "✔️" if id else "❌"
+            
+            job = queue_write({"action": "trade", "date": td.strftime("%Y-%m-%d"), "stock": ts, "type": tt, "price": tp, "total": tot, "shares": tsh, "fee": tf, "regular": mark_reg, "dividend": mark_div},
+                              f"交易：{tt} {ts} {tsh} 股")
+            
+            prefix_msg = ""
+            if ir: prefix_msg += "(定期定額) "
+            if id: prefix_msg += "(股息再投入) "
+            if job and tt == "買入" and prefix_msg:
+                msg = f"{prefix_msg}買入 {ts} {tsh}股 @ {tp} ，總共 {tot} 元"
+                st.toast(f"📮 {msg}", icon='♻️' if id else '📝')
+            elif job:
+                st.toast(f"📮 記錄中：{tt} {ts} {tsh} 股 (總額 ${tot:,})", icon='📝')
+            st.session_state['admin_expanded'] = True
+            if job: st.rerun()
+
+@st.fragment
+def import_tab(df_trans):
+    st.markdown("#### 📥 匯入券商對帳單")
+    st.caption("上傳券商匯出的成交明細 (CSV / Excel)，已在交易表中的交易會自動略過。")
+    up = st.file_uploader("對帳單檔案", type=["csv", "xlsx"], key="broker_file")
+    if up is None: return
+    c1, c2 = st.columns(2)
+    regular = c1.checkbox("買入皆為定期定額", True, key="import_regular")
+    reinvest = c2.checkbox("股息再投入", False, key="import_reinvest")
+    try:
+        trades = dedupe(to_trades(read_statement(up.name, up.getvalue()), regular, reinvest), df_trans)
+    except ImportError:
+        st.error("❌ 讀取 Excel 需要安裝 openpyxl，或改存成 CSV 再上傳"); return
+    except ValueError as e:
+        st.error(f"❌ 無法讀取對帳單：{e}"); return
+
+    counts = trades["狀態"].value_counts()
+    st.caption("　".join(f"{k} {v} 筆" for k, v in counts.items()))
+    st.dataframe(trades, hide_index=True, use_container_width=True,
+                 column_config={"日期": st.column_config.DateColumn(format="YYYY-MM-DD")})
+    payloads = trade_payloads(trades)
+    # 同一個檔案送出後，處理中或全部成功時停用按鈕；有失敗 (或沒排進佇列) 的，處理完後可以再匯入一次
+    state = import_state(up.file_id)
+    if state == DONE: st.caption("📮 這個檔案已匯入，表格更新後會顯示為「已存在」")
+    elif state == FAILED: st.caption("❌ 上次匯入有部分失敗，表格更新後已寫入的會顯示為「已存在」，可再匯入其餘的交易")
+    elif state == QUEUED: st.caption("📮 這個檔案匯入中…")
+    if st.button(f"匯入 {counts.get(NEW, 0)} 筆新交易", disabled=state not in (None, FAILED) or not payloads):
+        if IMPORT_BULK:
+            parts = chunks(payloads)
+            writes = [({"action": "import_trades", "trades": part}, f"匯入交易：第 {i}/{len(parts)} 批 ({len(part)} 筆)")
+                      for i, part in enumerate(parts, 1)]
+        else:
+            writes = [(dict(t, action="trade"), f"匯入交易：{i}/{len(payloads)} {t['type']} {t['stock']} {t['shares']:g} 股")
+                      for i, t in enumerate(payloads, 1)]
+        # 逐筆送出時一筆佔一格佇列；排不下就整批都不送，不留下匯入一半的狀態
+        free = get_write_queue().free()
+        if len(writes) > free:
+            st.error(f"❌ 寫入佇列目前只能再排 {free} 筆，這次有 {len(writes)} 筆：請把對帳單分成幾個檔案，"
+                     "或等目前的寫入完成再試 (Apps Script 支援 import_trades 時可設 gas_import_trades = true 分批送出)")
+            return
+        ids = []
+        for payload, label in writes:
+            job = queue_write(payload, label)
+            if not job: break
+            ids.append(job.id)
+        if ids:
+            st.session_state.setdefault("import_jobs", {})[up.file_id] = (ids, len(ids) == len(writes))
+            st.toast(f"📮 匯入中：{len(payloads)} 筆，分 {len(ids)} 次寫入")
+            st.rerun()
+
+def import_state(file_id):
+    """這個檔案上次匯入的結果：None (沒送過)、QUEUED (還有寫入在處理)、DONE 或 FAILED。"""
+    sent = st.session_state.get("import_jobs", {}).get(file_id)
+    if sent is None: return None
+    ids, queued_all = sent
+    jobs = get_write_queue().jobs(set(ids))
+    if not all(j.finished for j in jobs): return QUEUED
+    return FAILED if not queued_all or any(j.status == FAILED for j in jobs) else DONE
+
+@st.fragment
+def dividend_tab(df_stocks):
+    st.caption("💡 系統已升級「即時連動」：選好股票後，會自動帶入現有股數，並幫你算好實領金額！預設狀態為「未使用」。")
+    
+    c1, c2 = st.columns(2)
+    dd = c1.date_input("發放日", datetime.now(), key="div_date")
+    
+    opts = [f"{k} ({v})" for k, v in stock_map_dict.items()] if stock_map_dict else ["0050"]
+    sel = c1.selectbox("代號", opts + ["🖊️ 自行輸入"], key="div_stock_sel")
+    ds = c1.text_input("輸入代號", key="div_stock_input").strip() if sel == "🖊️ 自行輸入" else sel.split(" ")[0]
+    
+    dsea = c1.selectbox("季度", ["Q1", "Q2", "Q3", "Q4", "上半年", "下半年", "年度"], key="div_season")
+
+    # --- 計算該股票的目前總股數 ---
+    default_shares = 0
+    if df_stocks is not None and not df_stocks.empty:
+        matched = df_stocks[df_stocks["股票代號"] == ds]
+        if not matched.empty:
+            default_shares = int(matched["累積總股數"].sum())
+
+    # --- 破解 Streamlit 卡住魔法：利用 session_state 偵測股票切換 ---
+    if "prev_ds" not in st.session_state:
+        st.session_state.prev_ds = ds
+        st.session_state.div_shares_val = default_shares
+
+    if ds != st.session_state.prev_ds:
+        st.session_state.div_shares_val = default_shares
+        st.session_state.prev_ds = ds
+
+    # 讓除息股數去綁定 session_state 裡面的值
+    dh = c2.number_input("除息股數", step=100, key="div_shares_val")
+    dp = c2.number_input("配息單價", step=0.01, format="%.3f", value=0.0)
+
+    # 自動計算實領金額 (不扣手續費)
+    auto_dt = int(dh * dp)
+    
+    # 直接在畫面上秀出紅色的巨大金額字體！
+    st.markdown(f"#### 💰 預計實領金額： <span style='color:#ff2b2b'>**${auto_dt:,.0f}**</span>", unsafe_allow_html=True)
+    
+    # 使用獨立的按鈕取代原本的 form
+    if st.button("記錄股利", type="primary", use_container_width=True):
+        if auto_dt <= 0 and dp > 0:
+            st.warning("請確認股數或單價是否正確！")
+        else:
+            if queue_write({"action": "dividend", "date": dd.strftime("%Y-%m-%d"), "stock": ds, "season": dsea, "held_shares": dh, "div_price": dp, "total": auto_dt},
+                           f"股利：{ds} {dsea} ${auto_dt:,}"):
+                st.toast(f"📮 股利寫入中，金額 ${auto_dt:,}")
+                st.rerun()
+
+@st.fragment
+def div_status_tab(df_div):
+    st.info("這裡列出所有「未使用」的股利，你可以選擇將其領出或再投入。")
+    if df_div is not None and not df_div.empty:
+        if "狀態" in df_div.columns:
+            df_unused = backend.select("div", 狀態=UNUSED).reset_index(drop=True)
+            if not df_unused.empty:
+                # 以列號指定要改的資料列；日期、代號、季、金額一併送出，讓 Apps Script 確認該列沒被挪動
+                cols = [c for c in ["發放日期", "股票代號", "季", "除息股數", "配息單價", "實領金額"] if c in df_unused.columns]
+                select_all = st.checkbox(f"全選 ({len(df_unused)} 筆)", key="div_select_all")
+                # key 隨資料變動：狀態改完、列消失後舊的勾選不會留下來選到別筆股利
+                event = show_table(df_unused[cols], div_view, div_styler, on_select="rerun", selection_mode="multi-row",
+                                   key=table_key("div_unused_table", df_unused))
+                picked = df_unused if select_all else selected_rows(df_unused, event.selection.rows, ROW_KEY)
+                st.write(f"已選 **{len(picked)}** 筆，合計 **${picked['實領金額'].sum():,.0f}**")
+                new_status = st.radio("變更狀態為：", ["領出", "再投入股票"], horizontal=True)
+                if st.button(f"確認變更 {len(picked)} 筆", disabled=picked.empty):
+                    updates = [{"row": int(r[ROW_KEY]), "date": r["發放日期"].strftime('%Y-%m-%d') if pd.notna(r["發放日期"]) else "",
+                                "stock": str(r["股票代號"]), "season": str(r["季"]), "amount": float(r["實領金額"])}
+                               for _, r in picked.iterrows()]
+                    if DIV_BULK:
+                        jobs = [queue_write({"action": "update_div_status_bulk", "new_status": new_status, "updates": updates},
+                                            f"股利狀態：{len(updates)} 筆 ➝ {new_status}")]
+                    else:
+                        jobs = [queue_write({"action": "update_div_status", "new_status": new_status,
+                                             **{k: u[k] for k in ("date", "stock", "season", "amount")}},
+                                            f"股利狀態：{u['date']} {u['stock']} ➝ {new_status}") for u in updates]
+                    if any(jobs):
+                        st.toast(f"📮 狀態變更中：{sum(map(bool, jobs))} 筆 ➝ {new_status}")
+                        st.rerun()
+            else:
+                st.success("🎉 目前沒有閒置的股利！")
+        else:
+            st.warning("⚠️ 股利記錄表中缺少「狀態」欄位，請確認 Excel 的 G 欄標題有寫上「狀態」！")
+    else:
+        st.warning("無法讀取股利表")
+
 st.markdown("---") 
 st.markdown("### ⚙️ 後台管理")
 if 'admin_expanded' not in st.session_state: st.session_state['admin_expanded'] = False
@@ -390,156 +619,28 @@ with st.expander("🔧 點擊開啟管理面板", expanded=st.session_state['adm
                 st.error("Secrets 未設定 admin_password")
     else:
         st.success("🔓 管理員模式已啟用")
+        http_stats = http_pool.get_client().stats()
+        st.caption(f"🔌 HTTP 連線池：共 {http_stats['requests']} 次請求，新建 {http_stats['connections']} 條連線，重用 {http_stats['reused']} 次")
+        with st.expander("⏱️ 效能紀錄"):
+            metrics = get_metrics()
+            st.markdown(f"**本次 rerun**：共 {run.total * 1000:,.0f} ms")
+            c1, c2 = st.columns(2)
+            c1.dataframe(run.stage_frame(), hide_index=True, use_container_width=True, column_config={"毫秒": st.column_config.NumberColumn(format="%.1f")})
+            c2.dataframe(run.sheet_frame(), hide_index=True, use_container_width=True)
+            st.markdown(f"**最近 {len(metrics.runs())} 次 rerun**")
+            st.dataframe(metrics.summary(), hide_index=True, use_container_width=True,
+                         column_config={"p50 ms": st.column_config.NumberColumn(format="%.1f"), "p95 ms": st.column_config.NumberColumn(format="%.1f")})
+            rates = metrics.hit_rates()
+            if rates: st.caption("讀表結果比例：" + "、".join(f"{k} {v:.0%}" for k, v in rates.items()))
+            if metrics.log_path: st.caption(f"📝 每次 rerun 另記錄於 {metrics.log_path}")
         if st.button("🔒 登出"): st.session_state['admin_logged_in'] = False; st.session_state['admin_expanded'] = False; st.rerun()
 
         t1, t2, t3, t4, t5 = st.tabs(["🏷️ 股票", "💸 資金", "📝 交易", "💰 新增股利", "🏦 管理股利"])
 
-        with t1:
-            with st.form("stock_form"):
-                c1, c2 = st.columns(2)
-                mc = c1.text_input("代號", placeholder="0050").strip()
-                mn = c2.text_input("名稱", placeholder="元大台灣50").strip()
-                if st.form_submit_button("儲存"):
-                    requests.post(GAS_URL, json={"action": "update_stock", "stock": mc, "name": mn})
-                    st.toast(f"✅ 已更新：{mc} ➝ {mn}"); st.cache_data.clear(); st.rerun()
-            if stock_map_dict:
-                df_map = pd.DataFrame(list(stock_map_dict.items()), columns=['代號', '名稱']).sort_values('代號')
-                st.dataframe(df_map, use_container_width=True, hide_index=True)
-
-        with t2:
-            st.info("紀錄匯入或匯出證券交割戶的款項 (出金請輸入負數)")
-            with st.form("fund_form"):
-                c1, c2, c3 = st.columns(3)
-                fd = c1.date_input("日期", datetime.now())
-                fn = c2.selectbox("姓名", ["建蒼", "奕州"])
-                fa = c3.number_input("金額 (出金請輸入負數)", step=1000, value=0)
-                fnt = st.text_input("備註")
-                if st.form_submit_button("入帳"):
-                    requests.post(GAS_URL, json={"action": "fund", "date": fd.strftime("%Y-%m-%d"), "name": fn, "amount": fa, "note": fnt})
-                    st.toast("✅ 入帳成功"); st.cache_data.clear()
-
+        with t1: stock_tab()
+        with t2: fund_tab()
         with t3:
-            st.info("💡 **【股票分割 / 配股操作指南】**\n1. 類別選「股票分割 (配股)」\n2. 單價輸入 0\n3. 股數輸入「額外多拿到」的數量")
-            with st.form("trade_form"):
-                c1, c2 = st.columns(2)
-                td = c1.date_input("日期", datetime.now())
-                opts = [f"{k} ({v})" for k, v in stock_map_dict.items()] if stock_map_dict else ["0050", "006208"]
-                sel = c1.selectbox("代號", opts + ["🖊️ 自行輸入"])
-                ts = c1.text_input("輸入代號").strip() if sel == "🖊️ 自行輸入" else sel.split(" ")[0]
-                tt = c1.selectbox("類別", ["買入", "賣出", "股票分割 (配股)"])
-                ir = c1.checkbox("定期定額", True)
-                id = c1.checkbox("股息再投入", False)
-                tp = c2.number_input("單價", step=0.1, format="%.2f", value=0.0)
-                tsh = c2.number_input("股數", step=100)
-                tf = c2.number_input("手續費", value=20)
-                if st.form_submit_button("記錄"):
-                    tot = int(tp * tsh)
-                    mark_reg = "✔️" if ir else "❌"
-                    mark_div = "✔️" if id else "❌"
-                    
-                    requests.post(GAS_URL, json={"action": "trade", "date": td.strftime("%Y-%m-%d"), "stock": ts, "type": tt, "price": tp, "total": tot, "shares": tsh, "fee": tf, "regular": mark_reg, "dividend": mark_div})
-                    
-                    prefix_msg = ""
-                    if ir: prefix_msg += "(定期定額) "
-                    if id: prefix_msg += "(股息再投入) "
-                    if tt == "買入" and prefix_msg:
-                        msg = f"{prefix_msg}買入 {ts} {tsh}股 @ {tp} ，總共 {tot} 元"
-                        st.toast(f"✅ {msg}", icon='♻️' if id else '📝')
-                    else:
-                        st.toast(f"✅ 已記錄：{tt} {ts} {tsh} 股 (總額 ${tot:,})", icon='📝')
-                    st.session_state['admin_expanded'] = True
-                    st.cache_data.clear()
-
-        with t4:
-            st.caption("💡 系統已升級「即時連動」：選好股票後，會自動帶入現有股數，並幫你算好實領金額！預設狀態為「未使用」。")
-            
-            c1, c2 = st.columns(2)
-            dd = c1.date_input("發放日", datetime.now(), key="div_date")
-            
-            opts = [f"{k} ({v})" for k, v in stock_map_dict.items()] if stock_map_dict else ["0050"]
-            sel = c1.selectbox("代號", opts + ["🖊️ 自行輸入"], key="div_stock_sel")
-            ds = c1.text_input("輸入代號", key="div_stock_input").strip() if sel == "🖊️ 自行輸入" else sel.split(" ")[0]
-            
-            dsea = c1.selectbox("季度", ["Q1", "Q2", "Q3", "Q4", "上半年", "下半年", "年度"], key="div_season")
-
-            # --- 計算該股票的目前總股數 ---
-            default_shares = 0
-            if 'df_stocks' in locals() and not df_stocks.empty:
-                matched = df_stocks[df_stocks["股票代號"] == ds]
-                if not matched.empty:
-                    default_shares = int(matched["累積總股數"].sum())
-
-            # --- 破解 Streamlit 卡住魔法：利用 session_state 偵測股票切換 ---
-            if "prev_ds" not in st.session_state:
-                st.session_state.prev_ds = ds
-                st.session_state.div_shares_val = default_shares
-
-            if ds != st.session_state.prev_ds:
-                st.session_state.div_shares_val = default_shares
-                st.session_state.prev_ds = ds
-
-            # 讓除息股數去綁定 session_state 裡面的值
-            dh = c2.number_input("除息股數", step=100, key="div_shares_val")
-            dp = c2.number_input("配息單價", step=0.01, format="%.3f", value=0.0)
-
-            # 自動計算實領金額 (不扣手續費)
-            auto_dt = int(dh * dp)
-            
-            # 直接在畫面上秀出紅色的巨大金額字體！
-            st.markdown(f"#### 💰 預計實領金額： <span style='color:#ff2b2b'>**${auto_dt:,.0f}**</span>", unsafe_allow_html=True)
-            
-            # 使用獨立的按鈕取代原本的 form
-            if st.button("記錄股利", type="primary", use_container_width=True):
-                if auto_dt <= 0 and dp > 0:
-                    st.warning("請確認股數或單價是否正確！")
-                else:
-                    requests.post(GAS_URL, json={"action": "dividend", "date": dd.strftime("%Y-%m-%d"), "stock": ds, "season": dsea, "held_shares": dh, "div_price": dp, "total": auto_dt})
-                    st.toast(f"✅ 已成功寫入股利，金額 ${auto_dt:,}！")
-                    st.cache_data.clear()
-                    st.rerun()
-
-        with t5:
-            st.info("這裡列出所有「未使用」的股利，你可以選擇將其領出或再投入。")
-            if df_div is not None and not df_div.empty:
-                df_div_local = df_div.copy()
-                df_div_local.columns = df_div_local.columns.str.strip()
-                if "發放日期" in df_div_local.columns:
-                    df_div_local["發放日期"] = pd.to_datetime(df_div_local["發放日期"], errors='coerce').dt.strftime('%Y-%m-%d')
-                if "狀態" in df_div_local.columns:
-                    df_div_local["狀態"] = df_div_local["狀態"].fillna("未使用")
-                    df_unused = df_div_local[df_div_local["狀態"] == "未使用"].copy()
-                    if not df_unused.empty:
-                        df_unused["股票代號"] = clean_stock_code(df_unused["股票代號"])
-                        df_unused["標籤"] = df_unused.apply(lambda x: f"{x['發放日期']} | {x['股票代號']} | ${clean_number(x['實領金額']):,.0f} ({x['季']})", axis=1)
-                        target_div = st.selectbox("選擇一筆股利", df_unused["標籤"])
-                        selected_row = df_unused[df_unused["標籤"] == target_div].iloc[0]
-                        st.write(f"目前選定：**{selected_row['股票代號']}** 金額 **${clean_number(selected_row['實領金額']):,.0f}**")
-                        new_status = st.radio("變更狀態為：", ["領出", "再投入股票"], horizontal=True)
-                        if st.button("確認變更狀態"):
-                            try:
-                                res = requests.post(GAS_URL, json={
-                                    "action": "update_div_status",
-                                    "date": str(selected_row['發放日期']).strip(),
-                                    "stock": str(selected_row['股票代號']).strip(),
-                                    "season": str(selected_row['季']).strip(),
-                                    "amount": float(clean_number(selected_row['實領金額'])),
-                                    "new_status": new_status
-                                })
-                                if res.status_code == 200:
-                                    res_data = res.json()
-                                    if res_data.get("status") == "success":
-                                        st.toast(f"✅ 更新成功！已變更為：{new_status}")
-                                        st.cache_data.clear()
-                                        st.rerun()
-                                    else:
-                                        st.error(f"❌ Excel 更新失敗：{res_data.get('message')}")
-                                else:
-                                    st.error("❌ 連線錯誤")
-                            except Exception as e:
-                                st.error(f"連線錯誤：{e}")
-                    else:
-                        st.success("🎉 目前沒有閒置的股利！")
-                else:
-                    st.warning("⚠️ 股利記錄表中缺少「狀態」欄位，請確認 Excel 的 G 欄標題有寫上「狀態」！")
-            else:
-                st.warning("無法讀取股利表")
+            trade_tab()
+            import_tab(df_trans)
+        with t4: dividend_tab(df_stocks)
+        with t5: div_status_tab(df_div)
@@ -0,0 +1,80 @@
+import time
+
+from local_store import TABLES
+from sheets import (SheetLoad, data_age, data_version, invalidate_sheets, load_data, load_sheets, refresh_sheets,
+                    sheets_refreshing)
+
+# ==========================================
+# 資料來源：Google Sheet + Apps Script，或本機 SQLite
+# 兩者介面相同：load / select / invalidate / refresh / refreshing / age / version，寫入交給 WriteQueue (url 或 transport)
+# ==========================================
+class SheetsBackend:
+    """原本的做法：讀 Google Sheet 發佈的 CSV，寫入送到 Apps Script。urls 為 {表名: 網址}。"""
+
+    def __init__(self, urls, gas_url):
+        self.urls = urls
+        self.url = gas_url
+        self.transport = None
+
+    def load(self, stats=None):
+        return load_sheets(self.urls, stats=stats)
+
+    def select(self, name, **equals):
+        """整張表已在快取中，直接用 pandas 篩選。"""
+        df = load_data(self.urls[name], name)
+        if df is None or not equals: return df
+        mask = True
+        for col, value in equals.items():
+            mask = mask & (df[col] == value)
+        return df[mask]
+
+    def invalidate(self, names):
+        invalidate_sheets(*(self.urls[n] for n in names))
+
+    def refresh(self):
+        refresh_sheets()
+
+    def refreshing(self):
+        return sheets_refreshing()
+
+    def age(self):
+        return data_age()
+
+    def version(self):
+        return data_version()
+
+class LocalBackend:
+    """本機 SQLite (local_store.LocalStore)：讀寫都不經網路，篩選走資料庫索引。"""
+
+    def __init__(self, store):
+        self.store = store
+        self.url = None
+        self.transport = store.post
+
+    def load(self, stats=None):
+        frames = {}
+        for name in TABLES:
+            start = time.perf_counter()
+            frames[name] = self.store.load(name)
+            if stats is not None:
+                seconds = time.perf_counter() - start
+                stats[name] = SheetLoad("local", 0, len(frames[name]), 0.0, seconds, seconds)
+        return frames
+
+    def select(self, name, **equals):
+        return self.store.select(name, **equals)
+
+    def invalidate(self, names):
+        self.store.invalidate(names)
+
+    def refresh(self):
+        self.store.invalidate()
+
+    def refreshing(self):
+        return False
+
+    def age(self):
+        return 0.0  # 寫入即時生效，資料永遠是最新的
+
+    def version(self):
+        return 0    # 沒有背景更新，不會自己換資料
@@ -0,0 +1,33 @@
+"""clean_number 逐格 apply 與 to_number 整欄解析的速度比較。
+
+執行：python bench/bench_numbers.py [列數]
+"""
+import os
+import random
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from cleaning import clean_number, to_number  # noqa: E402
+
+def make_column(n, seed=0):
+    rng = random.Random(seed)
+    blanks = ["#N/A", "-", "", None]
+    return pd.Series([
+        rng.choice(blanks) if rng.random() < 0.05 else f"{rng.choice(['', '$', '-$'])}{rng.uniform(0, 2_000_000):,.{rng.choice([0, 2])}f}"
+        for _ in range(n)
+    ])
+
+def main(n=100_000, repeat=5):
+    col = make_column(n)
+    expected = col.apply(clean_number).astype("float64")
+    assert to_number(col).equals(expected), "to_number 與 clean_number 結果不一致"
+    t_apply = min(timeit.repeat(lambda: col.apply(clean_number), number=1, repeat=repeat))
+    t_vec = min(timeit.repeat(lambda: to_number(col), number=1, repeat=repeat))
+    print(f"{n:,} 列  apply(clean_number): {t_apply * 1000:8.1f} ms")
+    print(f"{n:,} 列  to_number:           {t_vec * 1000:8.1f} ms  ({t_apply / t_vec:.1f}x)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
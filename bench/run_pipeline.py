@@ -0,0 +1,128 @@
+"""整條儀表板流程的分段效能測試 (完全離線)。
+
+用 synthetic.py 產生假表，經由本機假伺服器提供，逐段計時：
+抓取、CSV 解析、依欄位定義整理 (ingest)、對帳、Styler 與 column_config 兩種持股表、個股明細。結果存成 JSON，可與舊版比較。
+
+執行：python bench/run_pipeline.py [--sizes 1000,10000] [--out 結果.json] [--compare 舊結果.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sheets  # noqa: E402
+from portfolio import _reconcile, build_stock_index, reconcile  # noqa: E402
+from positions import PositionBook, ledger_events  # noqa: E402
+from server import serve  # noqa: E402
+from synthetic import make_sheets, to_csv_bytes  # noqa: E402
+from views import holdings_frame, holdings_styler, holdings_view, trans_view  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+STAGES = ["fetch", "parse", "ingest", "reconcile", "reconcile_memo", "positions", "styler", "view", "drilldown"]
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+def _best(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+def bench_size(n_rows, repeat=3):
+    """回傳該資料量下各階段的最短耗時 (秒) 與資料規模。"""
+    files = to_csv_bytes(make_sheets(n_rows))
+    server, base = serve(files)
+    urls = {name: base + name for name in files}
+    timings = {}
+    try:
+        with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+            fetch = lambda: dict(zip(urls, pool.map(sheets._download, urls.values())))
+            raw = fetch()
+            timings["fetch"] = _best(fetch, repeat)
+    finally:
+        server.shutdown()
+    assert raw == files, "假伺服器回傳內容不一致"
+
+    # parse：不指定欄位定義的原始 read_csv；ingest：讀取並整理成各區塊使用的型別
+    timings["parse"] = _best(lambda: {name: sheets._parse(content, None) for name, content in raw.items()}, repeat)
+    ingest = lambda: {name: sheets._parse(content, name) for name, content in raw.items()}
+    frames = ingest()
+    timings["ingest"] = _best(ingest, repeat)
+    df_dash, df_trans, df_div, df_fund = (frames[k] for k in ("dash", "trans", "div", "fund"))
+
+    timings["reconcile"] = _best(lambda: _reconcile(df_dash, df_trans, df_div, df_fund), repeat)
+    recon = reconcile(df_dash, df_trans, df_div, df_fund)
+    timings["reconcile_memo"] = _best(lambda: reconcile(df_dash, df_trans, df_div, df_fund), repeat)
+
+    replay = lambda: PositionBook().apply(ledger_events(df_trans))
+    timings["positions"] = _best(replay, repeat)
+    book = PositionBook()
+    book.apply(ledger_events(df_trans))
+    positions = book.to_frame().set_index("股票代號")
+
+    stock_map = dict(zip(frames["stock_map"]["股票代號"], frames["stock_map"]["股票名稱"]))
+    timings["styler"] = _best(lambda: holdings_styler(holdings_frame(recon.df_stocks, stock_map, positions)).to_html(), repeat)
+    timings["view"] = _best(lambda: holdings_view(holdings_frame(recon.df_stocks, stock_map, positions)), repeat)
+
+    code = recon.df_stocks["股票代號"].iloc[0]
+    def drilldown():
+        build_stock_index.cache_clear()
+        index = build_stock_index(df_trans, df_div)
+        trans_view(index.trans[code])
+    timings["drilldown"] = _best(drilldown, repeat)
+
+    rows = {name: len(df) for name, df in frames.items()}
+    memory = sum(int(df.memory_usage(deep=True).sum()) for df in frames.values())
+    return {"rows": rows, "bytes": sum(len(c) for c in raw.values()), "memory": memory, "seconds": timings}
+
+def compare(old, new):
+    print(f"\n與 {old['meta']['commit']} 比較 (新 / 舊)：")
+    for size, res in new["results"].items():
+        prev = old["results"].get(size)
+        if not prev: continue
+        parts = [f"{s} {res['seconds'][s] / prev['seconds'][s]:.2f}x" for s in STAGES
+                 if s in res["seconds"] and prev["seconds"].get(s)]
+        print(f"  {int(size):>9,} 列  " + "  ".join(parts))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="交易表列數，逗號分隔")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="結果 JSON 路徑 (預設 bench/results/pipeline-<commit>.json)")
+    parser.add_argument("--compare", help="要比較的舊結果 JSON")
+    args = parser.parse_args(argv)
+
+    commit = _commit()
+    report = {
+        "meta": {"commit": commit, "python": platform.python_version(), "pandas": pd.__version__,
+                 "timestamp": datetime.datetime.now().isoformat(timespec="seconds")},
+        "results": {},
+    }
+    for size in (int(s) for s in args.sizes.split(",")):
+        res = bench_size(size, args.repeat)
+        report["results"][str(size)] = res
+        print(f"{size:>9,} 列  " + "  ".join(f"{s} {res['seconds'][s] * 1000:.1f}ms" for s in STAGES))
+
+    out = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"pipeline-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果已寫入 {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
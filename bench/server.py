@@ -0,0 +1,32 @@
+"""本機假 Google Sheet 伺服器：GET /<表名> 回傳 CSV，支援 keep-alive。"""
+import http.server
+import threading
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    files = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = self.files.get(self.path.strip("/").split("?")[0])
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(files, host="127.0.0.1", port=0):
+    """在背景執行緒啟動伺服器，回傳 (server, base_url)；結束時呼叫 server.shutdown()。"""
+    handler = type("Handler", (_Handler,), {"files": dict(files)})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/"
@@ -0,0 +1,98 @@
+"""產生與 Google Sheet 同欄位、同格式 (千分位、$、✔️/❌、合計列) 的假資料。"""
+import numpy as np
+import pandas as pd
+
+ETF_CODES = ["0050", "0056", "006208", "00878", "00919", "00713", "00929", "00692"]
+STATUSES = ["未使用", "領出", "再投入股票", None]
+SEASONS = ["Q1", "Q2", "Q3", "Q4", "上半年", "下半年", "年度"]
+
+def _money(values, dollar=False):
+    text = pd.Series(values).map("{:,.0f}".format)
+    return ("$" + text) if dollar else text
+
+def _dates(rng, n, start="2015-01-01", end="2025-12-31"):
+    days = pd.date_range(start, end, freq="D")
+    return pd.Series(np.sort(rng.choice(days.to_numpy(), n))).dt.strftime("%Y-%m-%d")
+
+def _codes(n_stocks):
+    stocks = [f"{c:04d}" for c in range(1101, 1101 + max(n_stocks - len(ETF_CODES), 0))]
+    return (ETF_CODES + stocks)[:n_stocks]
+
+def make_sheets(n_rows, n_stocks=50, seed=0):
+    """回傳 {表名: DataFrame}；n_rows 為交易表列數，其他表依比例縮放。"""
+    rng = np.random.default_rng(seed)
+    codes = np.array(_codes(n_stocks))
+    price = dict(zip(codes, rng.uniform(15, 900, len(codes)).round(2)))
+
+    # 交易表
+    trade_codes = rng.choice(codes, n_rows)
+    kind = rng.choice(["買入", "賣出", "股票分割 (配股)"], n_rows, p=[0.8, 0.15, 0.05])
+    shares = rng.integers(1, 40, n_rows) * 10
+    unit = np.array([price[c] for c in trade_codes]) * rng.uniform(0.7, 1.3, n_rows)
+    unit = np.where(kind == "股票分割 (配股)", 0, unit.round(2))
+    regular = rng.random(n_rows) < 0.6
+    trans = pd.DataFrame({
+        "日期": _dates(rng, n_rows),
+        "股票代號": trade_codes,
+        "交易類別": kind,
+        "成交單價": unit,
+        "投入金額": _money((unit * shares).astype(int)),
+        "成交股數": _money(shares),
+        "手續費": 20,
+        "定期定額": np.where(regular, "✔️", "❌"),
+        "股息再投入": np.where(~regular & (rng.random(n_rows) < 0.3), "✔️", "❌"),
+    })
+
+    # 股利表 (含合計列)
+    n_div = max(n_rows // 4, 1)
+    div_codes = rng.choice(codes, n_div)
+    held = rng.integers(1, 200, n_div) * 10
+    per_share = rng.uniform(0.2, 5, n_div).round(3)
+    div = pd.DataFrame({
+        "發放日期": _dates(rng, n_div),
+        "股票代號": div_codes,
+        "季": rng.choice(SEASONS, n_div),
+        "除息股數": held,
+        "配息單價": per_share,
+        "實領金額": _money((held * per_share).astype(int)),
+        "狀態": rng.choice(STATUSES, n_div),
+    })
+    div = pd.concat([div, pd.DataFrame({"股票代號": ["總計"], "實領金額": [f"{int((held * per_share).sum()):,}"]})], ignore_index=True)
+
+    # 資金表
+    n_fund = max(n_rows // 20, 1)
+    fund = pd.DataFrame({
+        "日期": _dates(rng, n_fund),
+        "姓名": rng.choice(["建蒼", "奕州"], n_fund),
+        "金額": _money(rng.integers(1, 50, n_fund) * 10000),
+        "備註": "",
+    })
+
+    # 儀表板 (每檔一列 + 合計列)
+    held_shares = rng.integers(1, 500, len(codes)) * 10
+    cost = held_shares * np.array([price[c] for c in codes]) * rng.uniform(0.8, 1.1, len(codes))
+    value = held_shares * np.array([price[c] for c in codes])
+    dash = pd.DataFrame({
+        "股票代號": codes,
+        "總投入本金": _money(cost, dollar=True),
+        "目前市值": _money(value, dollar=True),
+        "帳面損益": _money(value - cost, dollar=True),
+        "累積總股數": _money(held_shares),
+        "平均成本": (cost / held_shares).round(2),
+        "目前股價": [price[c] for c in codes],
+    })
+    dash = pd.concat([dash, pd.DataFrame({"股票代號": ["總計"], "總投入本金": [f"${cost.sum():,.0f}"], "目前市值": [f"${value.sum():,.0f}"]})], ignore_index=True)
+
+    n_act = max(n_rows // 10, 1)
+    act = pd.DataFrame({
+        "日期": _dates(rng, n_act, start="2025-01-01"),
+        "類型": rng.choice(["入金", "交易", "股利"], n_act),
+        "內容": rng.choice(["(定期定額) 買入 0050 100股", "(股息再投入) 買入 0056 50股", "建蒼 入金 10,000"], n_act),
+    })
+    msg = pd.DataFrame({"日期": _dates(rng, 20), "類型": rng.choice(["🎉 慶祝", "🔔 提醒", "📢 一般"], 20), "內容": "假公告"})
+    stock_map = pd.DataFrame({"股票代號": codes, "股票名稱": [f"股票{c}" for c in codes]})
+
+    return {"stock_map": stock_map, "msg": msg, "dash": dash, "trans": trans, "div": div, "fund": fund, "act": act}
+
+def to_csv_bytes(sheets):
+    return {name: df.to_csv(index=False).encode("utf-8") for name, df in sheets.items()}
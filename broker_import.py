@@ -0,0 +1,120 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from cleaning import clean_stock_code, to_number
+from ingest import CHECK_MARKS
+
+# ==========================================
+# 券商對帳單匯入：把券商匯出的 CSV / Excel 對應到交易表欄位，並和交易表比對去重
+# ==========================================
+IMPORT_CHUNK = 100  # 一次寫入請求最多帶幾筆交易
+
+NEW, EXISTING, INVALID = "新增", "已存在", "無法辨識"
+
+# 交易表欄位 ← 券商常見的欄名 (依序找，先找到先用)
+ALIASES = {
+    "日期": ["日期", "成交日期", "交易日期", "成交日"],
+    "股票代號": ["股票代號", "證券代號", "代號", "股票代碼", "商品代號"],
+    "交易類別": ["交易類別", "買賣別", "買賣", "交易別", "類別"],
+    "成交股數": ["成交股數", "股數", "成交數量", "數量"],
+    "成交單價": ["成交單價", "成交價", "成交價格", "單價", "價格"],
+    "手續費": ["手續費"],
+    "投入金額": ["投入金額", "成交金額", "價金"],
+    "定期定額": ["定期定額"],
+}
+BUY_WORDS = ("買", "申購", "扣款")
+SELL_WORDS = ("賣",)
+KEY_COLS = ["日期", "股票代號", "交易類別", "成交股數", "成交單價"]
+
+def read_statement(name, content):
+    """讀券商匯出檔；.xlsx 用 read_excel (需要 openpyxl)，其餘當 CSV (UTF-8 讀不了就用 Big5)。"""
+    if name.lower().endswith(".xlsx"):
+        return pd.read_excel(io.BytesIO(content), dtype=str)
+    try:
+        return pd.read_csv(io.BytesIO(content), dtype=str, encoding="utf-8-sig")
+    except UnicodeDecodeError:
+        return pd.read_csv(io.BytesIO(content), dtype=str, encoding="cp950")
+
+def _dates(series):
+    """西元或民國 (113/03/05) 日期都轉成 datetime64。"""
+    text = series.astype(str).str.strip()
+    roc = text.str.extract(r"^(\d{2,3})[/\-.](\d{1,2})[/\-.](\d{1,2})$")
+    roc_year = pd.to_numeric(roc[0], errors="coerce")
+    western = (roc_year + 1911).astype("Int64").astype(str) + "-" + roc[1] + "-" + roc[2]
+    return pd.to_datetime(text.mask(roc_year.notna(), western), errors="coerce", format="mixed")
+
+def _trade_type(series):
+    text = series.fillna("").astype(str).str.strip()
+    kind = np.select([text.str.contains("分割|配股"), text.str.contains("|".join(SELL_WORDS)),
+                      text.str.contains("|".join(BUY_WORDS))],
+                     ["股票分割 (配股)", "賣出", "買入"], default="")
+    return pd.Series(kind, index=series.index)
+
+def to_trades(raw, regular=True, reinvest=False):
+    """券商表 → 交易表欄位；認不出的欄位用預設值，缺日期 / 代號 / 類別 / 股數，
+    或買賣沒有金額 (對帳單沒有單價也沒有金額) 的列標為「無法辨識」。"""
+    raw = raw.rename(columns=lambda c: str(c).strip())
+    pick = {col: next((a for a in names if a in raw.columns), None) for col, names in ALIASES.items()}
+    missing = [col for col in ("日期", "股票代號", "交易類別", "成交股數") if pick[col] is None]
+    if missing:
+        raise ValueError(f"找不到欄位：{'、'.join(missing)}")
+    get = lambda col: raw[pick[col]] if pick[col] else pd.Series(np.nan, index=raw.index)
+
+    shares = to_number(get("成交股數")).abs()
+    price = to_number(get("成交單價"))
+    total = to_number(get("投入金額")).abs()
+    # 代號取開頭的英數字 (「2330 台積電」→ 2330)；空白或只有名稱的格子取不到，標為無法辨識
+    code = get("股票代號").astype(str).str.extract(r"^\s*(\d[0-9A-Za-z]*)", expand=False).str.upper()
+    trades = pd.DataFrame({
+        "日期": _dates(get("日期")),
+        "股票代號": clean_stock_code(code),
+        "交易類別": _trade_type(get("交易類別")),
+        "成交單價": price,
+        "成交股數": shares,
+        "投入金額": total.where(total > 0, (price * shares).astype(int)),
+        "手續費": to_number(get("手續費")),
+        "定期定額": get("定期定額").astype(str).str.strip().isin(CHECK_MARKS + ["是"]) if pick["定期定額"] else regular,
+        "股息再投入": reinvest,
+    })
+    trades["定期定額"] &= trades["交易類別"] == "買入"
+    valid = trades["日期"].notna() & (trades["交易類別"] != "") & (trades["成交股數"] > 0) & code.notna() & \
+        ((trades["投入金額"] > 0) | (trades["交易類別"] == "股票分割 (配股)"))
+    return trades.assign(狀態=np.where(valid, NEW, INVALID))
+
+def trade_keys(df):
+    """每列交易的雜湊鍵：(日期, 代號, 類別, 股數, 單價) 加上同樣內容在表中第幾次出現，
+    同一天兩筆一模一樣的定期定額才不會被當成同一筆。"""
+    keys = pd.DataFrame({
+        "日期": df["日期"].dt.strftime("%Y-%m-%d"),
+        "股票代號": df["股票代號"].astype(str),
+        "交易類別": df["交易類別"].astype(str),
+        "成交股數": df["成交股數"].astype(float),
+        "成交單價": df["成交單價"].astype(float).round(4),
+    })
+    row_hash = pd.util.hash_pandas_object(keys, index=False)
+    nth = row_hash.groupby(row_hash.to_numpy()).cumcount()
+    return pd.util.hash_pandas_object(pd.DataFrame({"h": row_hash, "n": nth}), index=False).to_numpy()
+
+def dedupe(trades, df_trans):
+    """把交易表已有的列標為「已存在」(以 trade_keys 建的雜湊索引比對)。"""
+    if df_trans is None or df_trans.empty or not set(KEY_COLS) <= set(df_trans.columns):
+        return trades
+    existing = pd.Index(trade_keys(df_trans.dropna(subset=["日期"])))
+    ok = trades["狀態"] == NEW
+    seen = np.zeros(len(trades), dtype=bool)
+    seen[ok.to_numpy()] = pd.Index(trade_keys(trades[ok])).isin(existing)
+    return trades.assign(狀態=trades["狀態"].mask(seen, EXISTING))
+
+def trade_payloads(trades):
+    """要新增的列 → 與交易表單相同格式的交易 dict。"""
+    new = trades[trades["狀態"] == NEW]
+    return [{"date": d.strftime("%Y-%m-%d"), "stock": s, "type": t, "price": float(p), "total": int(tot),
+             "shares": float(sh), "fee": float(f), "regular": "✔️" if r else "❌", "dividend": "✔️" if dv else "❌"}
+            for d, s, t, p, tot, sh, f, r, dv in zip(new["日期"], new["股票代號"], new["交易類別"], new["成交單價"],
+                                                     new["投入金額"], new["成交股數"], new["手續費"],
+                                                     new["定期定額"], new["股息再投入"])]
+
+def chunks(items, size=IMPORT_CHUNK):
+    return [items[i:i + size] for i in range(0, len(items), size)]
@@ -0,0 +1,36 @@
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+# ==========================================
+# 欄位清洗工具
+# ==========================================
+_BLANKS = ["#N/A", "-", "nan", ""]
+
+def clean_stock_code(series):
+    return (series.astype(str).str.replace(r'\.0$', '', regex=True).str.strip().str.zfill(4))
+
+def clean_number(x):
+    if pd.isna(x) or str(x).strip() in _BLANKS: return 0
+    try:
+        return float(str(x).replace(',', '').replace('$', ''))
+    except:
+        return 0
+
+def to_number(series):
+    """整欄版的 clean_number：結果與逐格 apply(clean_number) 相同，但改用 pandas 字串運算。"""
+    if is_numeric_dtype(series) and not is_bool_dtype(series):
+        return series.astype('float64').fillna(0.0)
+    raw = series.astype(str).str.strip()
+    blank = series.isna() | raw.isin(_BLANKS)
+    txt = raw.str.replace(',', '', regex=False).str.replace('$', '', regex=False).mask(blank, '0')
+    try:
+        return txt.astype('float64')
+    except (TypeError, ValueError):
+        pass
+    # 有無法直接轉換的格子：先用 to_numeric 容錯，剩下 float() 才認得的寫法再逐格解析，保證結果一致
+    num = pd.to_numeric(txt, errors='coerce').astype('float64')
+    retry = num.isna() & ~blank
+    num = num.fillna(0.0)
+    if retry.any():
+        num[retry] = series[retry].map(clean_number)
+    return num
@@ -0,0 +1,97 @@
+import pandas as pd
+
+from ingest import UNUSED
+from portfolio import FUND_MEMBERS, memoize_frames
+
+# ==========================================
+# 每日資產走勢 (投入本金 / 市值 / 累積股息 / 可用現金)
+# ==========================================
+HISTORY_COLS = ["投入本金", "市值", "累積股息", "可用現金"]
+
+def _dated(df, date_col):
+    if date_col not in df.columns: return None
+    df = df[df[date_col].notna()]
+    return df.assign(_day=df[date_col].dt.normalize())
+
+def _daily_cumsum(days, values, index):
+    """把每筆 (日期, 金額) 加總到日，再沿著連續日期累加。"""
+    if len(days) == 0: return pd.Series(0.0, index=index)
+    daily = pd.Series(values.to_numpy(), index=pd.DatetimeIndex(days.to_numpy())).groupby(level=0).sum()
+    return daily.reindex(index, fill_value=0.0).cumsum()
+
+def _events(df_trans, df_div, df_fund):
+    trans = _dated(df_trans, "日期") if df_trans is not None and not df_trans.empty else None
+    if trans is not None and not {"股票代號", "交易類別", "投入金額"} <= set(trans.columns): trans = None
+    div = _dated(df_div, "發放日期") if df_div is not None and not df_div.empty else None
+    if div is not None and "實領金額" not in div.columns: div = None
+    fund = _dated(df_fund, "日期") if df_fund is not None and not df_fund.empty else None
+    if fund is not None and not {"姓名", "金額"} <= set(fund.columns): fund = None
+    return trans, div, fund
+
+@memoize_frames()
+def build_history(df_trans, df_div, df_fund):
+    """以交易、股利、資金表算出每日走勢 (到最後一筆紀錄的日期為止)，全部用累加完成，不逐列迴圈。
+
+    歷史市值 = 每日持有股數 × 各股最近一次的成交單價。
+    """
+    trans, div, fund = _events(df_trans, df_div, df_fund)
+    days = [f["_day"] for f in (trans, div, fund) if f is not None and not f.empty]
+    if not days: return pd.DataFrame(columns=HISTORY_COLS, dtype="float64")
+    all_days = pd.concat(days)
+    index = pd.date_range(all_days.min(), all_days.max(), freq="D")
+    out = pd.DataFrame(0.0, index=index, columns=HISTORY_COLS)
+
+    if fund is not None:
+        fund = fund[fund["姓名"].isin(FUND_MEMBERS)]
+        fund_in = _daily_cumsum(fund["_day"], fund["金額"], index)
+    else:
+        fund_in = pd.Series(0.0, index=index)
+
+    unused_div = pd.Series(0.0, index=index)
+    if div is not None:
+        amount = div["實領金額"]
+        out["累積股息"] = _daily_cumsum(div["_day"], amount, index)
+        if "狀態" in div.columns:
+            unused = div["狀態"] == UNUSED
+            unused_div = _daily_cumsum(div.loc[unused, "_day"], amount[unused], index)
+
+    cash_buy = sells = pd.Series(0.0, index=index)
+    if trans is not None:
+        trans = trans.assign(_amount=trans["投入金額"],
+                             _shares=trans["成交股數"] if "成交股數" in trans.columns else 0.0,
+                             _price=trans["成交單價"] if "成交單價" in trans.columns else 0.0)
+        kind = trans["交易類別"]
+        is_buy, is_sell = kind == "買入", kind == "賣出"
+        reinvest = trans["股息再投入"] if "股息再投入" in trans.columns else False
+        cash_buy = _daily_cumsum(trans.loc[is_buy & ~reinvest, "_day"], trans.loc[is_buy & ~reinvest, "_amount"], index)
+        sells = _daily_cumsum(trans.loc[is_sell, "_day"], trans.loc[is_sell, "_amount"], index)
+
+        # 持股：買入、配股加股數，賣出減股數；價格：各股最近一次成交單價往後延用
+        signed = trans["_shares"].where(~is_sell, -trans["_shares"]).where(is_buy | is_sell | kind.str.contains("分割|配股", na=False), 0.0)
+        shares = (trans.assign(_signed=signed).pivot_table(index="_day", columns="股票代號", values="_signed", aggfunc="sum",
+                                                                fill_value=0.0, observed=True)
+                  .reindex(index, fill_value=0.0).cumsum())
+        priced = trans[trans["_price"] > 0].sort_values("_day", kind="stable")
+        prices = (priced.groupby(["_day", "股票代號"], observed=True)["_price"].last().unstack()
+                  .reindex(index).ffill().reindex(columns=shares.columns))
+        out["市值"] = (shares * prices).sum(axis=1, min_count=1).fillna(0.0)
+
+    out["投入本金"] = cash_buy - sells
+    out["可用現金"] = fund_in - cash_buy + sells + unused_div
+    return out
+
+def history_until(history, day, latest_value=None):
+    """把快取的走勢截到或延伸到 day (沿用最後一天的數值)，並可用即時市值覆蓋最後一天 (day 當天)。
+
+    表中可能有日期在 day 之後的紀錄 (例如先登記的未來發放日股利)，那幾天不會畫出來。
+    """
+    if history.empty: return history
+    history = history.loc[:day]
+    if history.empty: return history
+    if day > history.index[-1]:
+        history = history.reindex(pd.date_range(history.index[0], day, freq="D"), method="ffill")
+    else:
+        history = history.copy(deep=False)  # copy-on-write：下面改最後一天時只會複製「市值」欄
+    if latest_value is not None:
+        history.iloc[-1, history.columns.get_loc("市值")] = latest_value
+    return history
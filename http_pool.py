@@ -0,0 +1,87 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ==========================================
+# 共用 HTTP 連線池 (讀表與 Apps Script 寫入共用，保持 keep-alive)
+# ==========================================
+POOL_SIZE = 10        # 每個主機最多保留幾條連線
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30     # 讀表與寫入共用 (Apps Script 冷啟動可能要十幾秒)；secrets 的 http_read_timeout 可改
+
+def _counting(pool_cls, counter):
+    """回傳一個會記錄「新建連線 (TCP + TLS)」與「實際送出請求」次數的連線池類別。"""
+    base = pool_cls.ConnectionCls
+
+    class CountingConnection(base):
+        def connect(self):
+            counter("connections")
+            return super().connect()
+
+        def request(self, *args, **kwargs):
+            counter("requests")
+            return super().request(*args, **kwargs)
+
+    return type(pool_cls.__name__, (pool_cls,), {"ConnectionCls": CountingConnection})
+
+class _CountingAdapter(HTTPAdapter):
+    def __init__(self, counter, **kwargs):
+        self._counter = counter
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: _counting(cls, self._counter) for scheme, cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+class HttpClient:
+    """程序共用的 requests.Session，並記錄請求數與新建連線數，用來確認連線真的有被重用。"""
+
+    def __init__(self, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        self.settings = (pool_size, connect_timeout, read_timeout)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "connections": 0}
+        self.session = requests.Session()
+        adapter = _CountingAdapter(self._count, pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _timeout(self, read_timeout):
+        return (self.connect_timeout, read_timeout or self.read_timeout)
+
+    def request(self, method, url, timeout=None, **kwargs):
+        return self.session.request(method, url, timeout=self._timeout(timeout), **kwargs)
+
+    def get(self, url, timeout=None, **kwargs):
+        return self.request("GET", url, timeout=timeout, **kwargs)
+
+    def post(self, url, timeout=None, **kwargs):
+        return self.request("POST", url, timeout=timeout, **kwargs)
+
+    def stats(self):
+        # 轉址 (例如 docs.google.com → googleusercontent.com) 的每一跳都各算一次請求
+        with self._lock:
+            return dict(self._counts, reused=max(self._counts["requests"] - self._counts["connections"], 0))
+
+_client = HttpClient()
+_client_lock = threading.Lock()
+
+def get_client():
+    return _client
+
+def configure(pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+    """設定改變時才換一個新的連線池；每次 rerun 都呼叫也不會重建連線。"""
+    global _client
+    with _client_lock:
+        if _client.settings != (pool_size, connect_timeout, read_timeout):
+            _client.session.close()
+            _client = HttpClient(pool_size, connect_timeout, read_timeout)
+    return _client
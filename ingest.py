@@ -0,0 +1,110 @@
+import io
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from cleaning import clean_stock_code, to_number
+
+# ==========================================
+# 讀表時依欄位定義一次整理好：欄名去空白、只讀需要的欄位、直接轉成正確型別
+# 之後各區塊拿到的都是整理好的表，不再各自清洗，也不可原地修改
+# ==========================================
+# 快取的表以 copy-on-write 檢視分給各 session (見 share)；pandas 3 起一律開啟，2.x 要手動打開
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+CHECK_MARKS = ['Y', '✅', '✔️']
+UNUSED = "未使用"
+ROW_KEY = "列號"  # 在 Google Sheet 中的列號 (標題為第 1 列)，寫回時用來指定資料列
+
+# 欄位型別
+CODE = "code"          # 股票代號：補零後存成 category
+CODE_TEXT = "code_text"  # 股票代號：補零後存成字串 (列數少的表)
+CATEGORY = "category"  # 去空白後存成 category
+STATUS = "status"      # 股利狀態：空白視為「未使用」，存成 category
+FLAG = "flag"          # ✔️ / Y / ✅ → True，其餘 False
+NUMBER = "number"      # 千分位、$、#N/A 等一律轉成 float64 (空白為 0)
+DATE = "date"          # 轉成 datetime64，讀不懂的為 NaT
+TEXT = "text"          # 去空白的字串
+
+# columns: {欄名: 型別}；drop_totals: 去掉「股票代號」含「計 / Total」的合計列；row_key: 另加「列號」欄
+Schema = namedtuple("Schema", ["columns", "drop_totals", "row_key"], defaults=[False])
+
+SCHEMAS = {
+    "dash": Schema({"股票代號": CODE_TEXT, "總投入本金": NUMBER, "目前市值": NUMBER, "帳面損益": NUMBER,
+                    "累積總股數": NUMBER, "平均成本": NUMBER, "目前股價": NUMBER}, True),
+    "trans": Schema({"日期": DATE, "股票代號": CODE, "交易類別": CATEGORY, "成交單價": NUMBER, "投入金額": NUMBER,
+                     "成交股數": NUMBER, "手續費": NUMBER, "定期定額": FLAG, "股息再投入": FLAG}, False),
+    "div": Schema({"發放日期": DATE, "股票代號": CODE, "季": CATEGORY, "除息股數": NUMBER, "配息單價": NUMBER,
+                   "實領金額": NUMBER, "狀態": STATUS}, True, row_key=True),
+    "fund": Schema({"日期": DATE, "姓名": CATEGORY, "金額": NUMBER, "備註": TEXT}, False),
+    "act": Schema({"日期": DATE, "類型": TEXT, "內容": TEXT}, False),
+    "msg": Schema({"日期": DATE, "類型": TEXT, "內容": TEXT}, False),
+    "stock_map": Schema({"股票代號": TEXT, "股票名稱": TEXT}, False),
+}
+
+def share(obj):
+    """把程序共用的快取結果交給呼叫端：DataFrame 換成不複製資料的淺層檢視 (namedtuple / dict 內的也是)。
+
+    copy-on-write 下，呼叫端新增或改名欄位、改值都只會動到自己這份，快取裡的原件不會被改到；
+    直接寫入 to_numpy() 拿到的陣列則會丟出 ValueError (唯讀)。
+    """
+    if isinstance(obj, pd.DataFrame): return obj.copy(deep=False)
+    if isinstance(obj, tuple) and hasattr(obj, "_fields"): return obj._make(share(v) for v in obj)
+    if isinstance(obj, dict): return {k: share(v) for k, v in obj.items()}
+    return obj
+
+def _stripped_text(series):
+    return series.astype(object).where(series.isna(), series.astype(str).str.strip())
+
+def _per_unique(series, fn, missing=np.nan):
+    """欄位重複值多 (股票代號、類別、狀態…)：只對不重複的值做 fn，再依位置展開回整欄。"""
+    codes, uniques = pd.factorize(series)
+    done = np.append(np.asarray(fn(pd.Series(uniques, dtype=object)), dtype=object), missing)
+    return done[codes]  # codes 為 -1 (空白格) 時取到最後的 missing
+
+def _category(values, index):
+    return pd.Series(pd.Categorical(values), index=index)
+
+def _convert(series, kind):
+    if kind == CODE: return _category(_per_unique(series, clean_stock_code), series.index)
+    if kind == CODE_TEXT: return clean_stock_code(series)
+    if kind == CATEGORY: return _category(_per_unique(series, _stripped_text), series.index)
+    if kind == STATUS:
+        status = _per_unique(series, lambda s: _stripped_text(s).replace("", UNUSED), missing=UNUSED)
+        return _category(status, series.index)
+    if kind == FLAG:
+        flags = _per_unique(series, lambda s: s.astype(str).str.strip().isin(CHECK_MARKS), missing=False)
+        return pd.Series(flags.astype(bool), index=series.index)
+    if kind == NUMBER: return to_number(series)
+    if kind == DATE: return pd.to_datetime(series, errors="coerce")
+    return _stripped_text(series)
+
+def normalize(df, name):
+    """把已讀進來的表 (CSV 或本機資料庫) 依 SCHEMAS[name] 整理；表裡沒有的欄位就不會出現在結果中。"""
+    schema = SCHEMAS[name]
+    df = df.rename(columns=lambda c: str(c).strip())
+    cols = [col for col in schema.columns if col in df.columns]
+    if schema.row_key:
+        df = df[df[cols].notna().any(axis=1)]
+    if schema.drop_totals and "股票代號" in df.columns:
+        df = df[~df["股票代號"].astype(str).str.contains("計|Total", na=False)]
+    out = {col: _convert(df[col], schema.columns[col]) for col in cols}
+    if schema.row_key and ROW_KEY in df.columns: out[ROW_KEY] = df[ROW_KEY]
+    return pd.DataFrame(out).reset_index(drop=True)
+
+def ingest(content, name):
+    """把 CSV 原始內容依 SCHEMAS[name] 讀成整理好的 DataFrame。"""
+    schema = SCHEMAS[name]
+    header = pd.read_csv(io.BytesIO(content), nrows=0).columns
+    raw = {}
+    for col in header:
+        if col.strip() in schema.columns: raw.setdefault(col.strip(), col)
+    text_cols = {raw[c] for c, kind in schema.columns.items() if c in raw and kind not in (NUMBER, DATE)}
+    # 需要列號的表不略過空白行，資料列的位置才會和 Google Sheet 一致
+    df = pd.read_csv(io.BytesIO(content), usecols=list(raw.values()), dtype={c: str for c in text_cols},
+                     skip_blank_lines=not schema.row_key)
+    if schema.row_key:
+        df[ROW_KEY] = np.arange(len(df)) + 2
+    return normalize(df, name)
@@ -0,0 +1,253 @@
+"""本機資料庫：把七張表存在 SQLite，讀取與寫入都不需要連網。
+
+寫入動作與 Apps Script 相同 (payload 與回應格式一致)，可直接當 WriteQueue 的 transport。
+從 Google Sheet 或 CSV 建立資料庫：python local_store.py 資料庫路徑 trans=網址或檔案 div=... ...
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import closing
+
+import pandas as pd
+
+from ingest import DATE, FLAG, NUMBER, ROW_KEY, SCHEMAS, UNUSED, ingest, normalize, share
+from positions import PositionBook, ledger_events
+
+# ==========================================
+# 本機 SQLite 資料庫 (含索引)
+# ==========================================
+LOCAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "local.sqlite3")
+
+# 常用的篩選欄位建索引：查某檔股票、某段日期、未使用的股利不必掃整張表
+INDEXES = {
+    "trans": [["股票代號"], ["日期"]],
+    "div": [["股票代號"], ["發放日期"], ["狀態"]],
+    "fund": [["日期"]],
+    "act": [["日期"]],
+    "msg": [["日期"]],
+    "dash": [["股票代號"]],
+    "stock_map": [["股票代號"]],
+}
+TABLES = list(INDEXES)
+
+def _q(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _storable(df, name):
+    """整理好的 DataFrame → 可寫進 SQLite 的欄位值 (日期存 YYYY-MM-DD 字串、旗標存 ✔️ / ❌)。"""
+    out = {}
+    for col, kind in SCHEMAS[name].columns.items():
+        if col not in df.columns: continue
+        s = df[col]
+        if kind == DATE: s = s.dt.strftime("%Y-%m-%d")
+        elif kind == FLAG: s = s.map({True: "✔️", False: "❌"})
+        elif kind == NUMBER: s = s.astype(float)
+        else: s = s.astype(object)
+        out[col] = s.astype(object).where(s.notna(), None)
+    return pd.DataFrame(out)
+
+class LocalStore:
+    """SQLite 版的七張表；讀出的結果與 ingest 整理過的 Google Sheet 相同，div 的列號為 rowid。
+
+    每張表有版本號，寫入時遞增；load 在版本沒變時直接回傳記憶體中的結果。
+    dash 的持股、成本在交易寫入後依交易表重算，目前股價則沿用資料庫裡的值 (離線無法更新報價)。
+    """
+
+    def __init__(self, path=LOCAL_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._versions = dict.fromkeys(TABLES, 0)
+        self._frames = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for name in TABLES:
+                cols = ", ".join(f"{_q(c)} {'REAL' if k == NUMBER else 'TEXT'}" for c, k in SCHEMAS[name].columns.items())
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {_q(name)} ({cols})")
+                for idx in INDEXES[name]:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {_q(f'ix_{name}_' + '_'.join(idx))} "
+                                 f"ON {_q(name)} ({', '.join(map(_q, idx))})")
+            conn.execute("CREATE TABLE IF NOT EXISTS applied (key TEXT PRIMARY KEY, result TEXT)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    # ------------------------------------------
+    # 讀取
+    # ------------------------------------------
+    def _read(self, name, where="", params=()):
+        cols = ", ".join(map(_q, SCHEMAS[name].columns))
+        if SCHEMAS[name].row_key: cols = f"rowid AS {_q(ROW_KEY)}, {cols}"
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query(f"SELECT {cols} FROM {_q(name)} {where} ORDER BY rowid", conn, params=params)
+        return normalize(df, name)
+
+    def load(self, name):
+        with self._lock:
+            version = self._versions[name]
+            cached = self._frames.get(name)
+            if cached and cached[0] == version: return share(cached[1])
+        frame = self._read(name)
+        with self._lock:
+            if self._versions[name] == version: self._frames[name] = (version, frame)
+        return share(frame)
+
+    def select(self, name, **equals):
+        """欄位等於指定值的列 (走索引)，例如 select("trans", 股票代號="0050")、select("div", 狀態="未使用")。"""
+        where = " AND ".join(f"{_q(col)} = ?" for col in equals)
+        return self._read(name, f"WHERE {where}" if where else "", tuple(equals.values()))
+
+    def invalidate(self, names=None):
+        with self._lock:
+            for name in names or TABLES:
+                self._frames.pop(name, None)
+
+    # ------------------------------------------
+    # 寫入
+    # ------------------------------------------
+    def import_frames(self, frames):
+        """用整理好的表 (例如從 Google Sheet 讀到的) 整張取代資料庫中的同名表。"""
+        with self._lock, closing(self._connect()) as conn, conn:
+            for name, df in frames.items():
+                conn.execute(f"DELETE FROM {_q(name)}")
+                self._insert(conn, name, _storable(df, name).to_dict("records"))
+            self._bump(frames)
+
+    def _insert(self, conn, name, rows):
+        if not rows: return
+        cols = [c for c in SCHEMAS[name].columns if c in rows[0]]
+        conn.executemany(f"INSERT INTO {_q(name)} ({', '.join(map(_q, cols))}) VALUES ({', '.join('?' * len(cols))})",
+                         [[row.get(c) for c in cols] for row in rows])
+
+    def _bump(self, names):
+        for name in names:
+            self._versions[name] += 1
+            self._frames.pop(name, None)
+
+    def post(self, body):
+        """處理一次寫入請求 (單筆動作或 {"action": "batch", "actions": [...]})，回傳與 Apps Script 相同格式的 dict。"""
+        if body.get("action") == "batch":
+            return {"status": "success", "results": [dict(self._apply(a), idempotency_key=a.get("idempotency_key"))
+                                                      for a in body.get("actions", [])]}
+        return self._apply(body)
+
+    def _apply(self, action):
+        key = action.get("idempotency_key")
+        handler = getattr(self, "_do_" + str(action.get("action")), None)
+        if handler is None:
+            return {"status": "error", "message": f"不支援的動作：{action.get('action')}"}
+        with self._lock, closing(self._connect()) as conn, conn:
+            if key:
+                done = conn.execute("SELECT result FROM applied WHERE key = ?", (key,)).fetchone()
+                if done: return json.loads(done[0])  # 重試的請求：已經寫過，直接回傳上次的結果
+            touched = set()
+            result = handler(conn, action, touched)
+            if "trans" in touched: self._rebuild_dash(conn)
+            if key: conn.execute("INSERT INTO applied VALUES (?, ?)", (key, json.dumps(result, ensure_ascii=False)))
+            self._bump(touched | ({"dash"} if "trans" in touched else set()))
+        return result
+
+    def _log(self, conn, touched, date, kind, content):
+        self._insert(conn, "act", [{"日期": date, "類型": kind, "內容": content}])
+        touched.add("act")
+
+    def _do_msg(self, conn, a, touched):
+        self._insert(conn, "msg", [{"日期": a["date"], "類型": a["type"], "內容": a["content"]}])
+        touched.add("msg")
+        return {"status": "success"}
+
+    def _do_update_stock(self, conn, a, touched):
+        cur = conn.execute('UPDATE stock_map SET "股票名稱" = ? WHERE "股票代號" = ?', (a["name"], a["stock"]))
+        if cur.rowcount == 0: self._insert(conn, "stock_map", [{"股票代號": a["stock"], "股票名稱": a["name"]}])
+        touched.add("stock_map")
+        return {"status": "success"}
+
+    def _do_fund(self, conn, a, touched):
+        self._insert(conn, "fund", [{"日期": a["date"], "姓名": a["name"], "金額": float(a["amount"]), "備註": a.get("note", "")}])
+        self._log(conn, touched, a["date"], "入金" if float(a["amount"]) >= 0 else "出金", f"{a['name']} ${float(a['amount']):,.0f}")
+        touched.add("fund")
+        return {"status": "success"}
+
+    def _trade_row(self, t):
+        return {"日期": t["date"], "股票代號": t["stock"], "交易類別": t["type"], "成交單價": float(t["price"]),
+                "投入金額": float(t["total"]), "成交股數": float(t["shares"]), "手續費": float(t["fee"]),
+                "定期定額": t["regular"], "股息再投入": t["dividend"]}
+
+    def _do_trade(self, conn, a, touched):
+        self._insert(conn, "trans", [self._trade_row(a)])
+        prefix = ("(定期定額) " if a["regular"] == "✔️" else "") + ("(股息再投入) " if a["dividend"] == "✔️" else "")
+        self._log(conn, touched, a["date"], "交易", f"{prefix}{a['type']} {a['stock']} {a['shares']:g}股 @ {a['price']}")
+        touched.add("trans")
+        return {"status": "success"}
+
+    def _do_import_trades(self, conn, a, touched):
+        trades = a.get("trades", [])
+        self._insert(conn, "trans", [self._trade_row(t) for t in trades])
+        if trades: self._log(conn, touched, max(t["date"] for t in trades), "交易", f"匯入 {len(trades)} 筆交易")
+        touched.add("trans")
+        return {"status": "success"}
+
+    def _do_dividend(self, conn, a, touched):
+        self._insert(conn, "div", [{"發放日期": a["date"], "股票代號": a["stock"], "季": a["season"],
+                                    "除息股數": float(a["held_shares"]), "配息單價": float(a["div_price"]),
+                                    "實領金額": float(a["total"]), "狀態": UNUSED}])
+        self._log(conn, touched, a["date"], "股利", f"{a['stock']} {a['season']} 配息 ${float(a['total']):,.0f}")
+        touched.add("div")
+        return {"status": "success"}
+
+    def _do_update_div_status_bulk(self, conn, a, touched):
+        rows = []
+        for u in a.get("updates", []):
+            found = conn.execute('SELECT "發放日期", "股票代號", "季", "實領金額" FROM div WHERE rowid = ?', (u["row"],)).fetchone()
+            if found is None or tuple(found[:3]) != (u["date"], u["stock"], u["season"]) or abs((found[3] or 0) - u["amount"]) > 0.5:
+                rows.append({"row": u["row"], "status": "error", "message": "資料列已變動"})
+                continue
+            conn.execute('UPDATE div SET "狀態" = ? WHERE rowid = ?', (a["new_status"], u["row"]))
+            rows.append({"row": u["row"], "status": "success"})
+        touched.add("div")
+        return {"status": "success", "rows": rows}
+
+    def _rebuild_dash(self, conn):
+        """依交易表重算各股股數與成本，目前股價沿用 dash 原本的值。"""
+        trans = normalize(pd.read_sql_query("SELECT * FROM trans ORDER BY rowid", conn), "trans")
+        prices = dict(conn.execute('SELECT "股票代號", "目前股價" FROM dash').fetchall())
+        book = PositionBook()
+        book.apply(ledger_events(trans))
+        pos = book.to_frame()
+        pos = pos[pos["持有股數"] > 0]
+        price = pos["股票代號"].map(prices).fillna(0.0).astype(float)
+        value = pos["持有股數"] * price
+        conn.execute("DELETE FROM dash")
+        self._insert(conn, "dash", pd.DataFrame({
+            "股票代號": pos["股票代號"], "總投入本金": pos["持有成本"], "目前市值": value, "帳面損益": value - pos["持有成本"],
+            "累積總股數": pos["持有股數"], "平均成本": pos["平均成本"], "目前股價": price}).to_dict("records"))
+
+def _read_source(src):
+    if src.startswith(("http://", "https://")):
+        from http_pool import get_client
+        res = get_client().get(src, timeout=30)
+        res.raise_for_status()
+        return res.content
+    with open(src, "rb") as f:
+        return f.read()
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) < 2 or any("=" not in a for a in args[1:]):
+        print(__doc__)
+        return 1
+    sources = dict(a.split("=", 1) for a in args[1:])
+    unknown = set(sources) - set(TABLES)
+    if unknown:
+        print(f"不認得的表名：{'、'.join(sorted(unknown))} (可用：{'、'.join(TABLES)})")
+        return 1
+    store = LocalStore(args[0])
+    store.import_frames({name: ingest(_read_source(src), name) for name, src in sources.items()})
+    for name in sources:
+        print(f"{name}: {len(store.load(name))} 列")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
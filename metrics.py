@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 效能紀錄：每次 rerun 各階段耗時，保留最近幾次供後台查看
+# ==========================================
+HISTORY = 50  # 保留最近幾次 rerun
+
+class RunMetrics:
+    """單次 rerun 的紀錄：各階段耗時 (秒，依執行順序) 與每張表的讀取情形 (sheets.SheetLoad)。
+
+    fragment 單獨重跑時 fragment 為其名稱，整頁 rerun 為 None。
+    """
+
+    def __init__(self, fragment=None):
+        self.fragment = fragment
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.stages = {}
+        self.sheets = {}
+        self.total = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def finish(self):
+        self.total = time.perf_counter() - self._t0
+        return self
+
+    def stage_frame(self):
+        return pd.DataFrame({"階段": list(self.stages), "毫秒": [s * 1000 for s in self.stages.values()]})
+
+    def sheet_frame(self):
+        return pd.DataFrame([{"表": name, "結果": load.outcome, "下載 KB": load.bytes / 1024, "列數": load.rows,
+                              "下載 ms": load.fetch_s * 1000, "解析 ms": load.parse_s * 1000, "總計 ms": load.seconds * 1000}
+                             for name, load in self.sheets.items()])
+
+    def to_dict(self):
+        return {"started": self.started, "fragment": self.fragment, "total": self.total, "stages": self.stages,
+                "sheets": {name: load._asdict() for name, load in self.sheets.items()}}
+
+class MetricsStore:
+    """程序共用、執行緒安全的最近 N 次 rerun 紀錄；設定 log_path 時每次 rerun 另外附加一行 JSON 到該檔。"""
+
+    def __init__(self, history=HISTORY, log_path=None):
+        self.log_path = log_path
+        self._runs = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def add(self, run):
+        with self._lock:
+            self._runs.append(run)
+        if self.log_path:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(run.to_dict(), ensure_ascii=False) + "\n")
+            except OSError:
+                pass
+
+    def runs(self):
+        with self._lock:
+            return list(self._runs)
+
+    def summary(self):
+        """最近幾次 rerun 每個階段的 p50 / p95 (毫秒)，另附整頁 rerun 的總耗時 (fragment 單獨重跑只計入該階段)。"""
+        runs = self.runs()
+        samples = {}
+        for run in runs:
+            for name, sec in run.stages.items():
+                samples.setdefault(name, []).append(sec * 1000)
+            if run.total is not None and run.fragment is None:
+                samples.setdefault("整次 rerun", []).append(run.total * 1000)
+        rows = [{"階段": name, "次數": len(v), "p50 ms": np.percentile(v, 50), "p95 ms": np.percentile(v, 95)}
+                for name, v in samples.items()]
+        return pd.DataFrame(rows, columns=["階段", "次數", "p50 ms", "p95 ms"])
+
+    def hit_rates(self):
+        loads = [load for run in self.runs() for load in run.sheets.values()]
+        if not loads: return {}
+        counts = pd.Series([load.outcome for load in loads]).value_counts()
+        return (counts / counts.sum()).to_dict()
@@ -0,0 +1,175 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ingest import UNUSED, share
+from xirr import cash_flows, holding_xirr
+
+# ==========================================
+# 對帳引擎 (算法B：真實本金對帳)
+# ==========================================
+FUND_MEMBERS = ['建蒼', '奕州']
+
+Reconciliation = namedtuple("Reconciliation", [
+    "df_stocks", "total_cost", "total_value", "total_profit",
+    "available_cash", "total_div_all", "remaining_div", "roi_with_div", "xirr",
+])
+
+# 傳入的表都已經過 ingest 整理 (型別正確、合計列已去除)，這裡只做計算，不修改傳入的表
+def _usable(df):
+    return df is not None and not df.empty
+
+def fund_total(df_fund):
+    """1. 資金進出總計"""
+    if not _usable(df_fund) or not {'姓名', '金額'} <= set(df_fund.columns): return 0
+    return df_fund.loc[df_fund['姓名'].isin(FUND_MEMBERS), '金額'].sum()
+
+def trade_flows(df_trans):
+    """2. 交易計算：回傳 (各股股息再投入金額, 現金買入花費, 賣出收入)"""
+    if not _usable(df_trans): return {}, 0, 0
+    if not {'股票代號', '股息再投入', '投入金額', '交易類別'} <= set(df_trans.columns): return {}, 0, 0
+    mask_reinvest = df_trans['股息再投入']
+    is_buy = df_trans['交易類別'] == '買入'
+    is_sell = df_trans['交易類別'] == '賣出'
+
+    reinvest_dict = df_trans[mask_reinvest & is_buy].groupby('股票代號', observed=True)['投入金額'].sum().to_dict()
+    total_cash_out = df_trans.loc[is_buy & (~mask_reinvest), '投入金額'].sum()
+    total_cash_rev = df_trans.loc[is_sell, '投入金額'].sum()
+    return reinvest_dict, total_cash_out, total_cash_rev
+
+def dividend_totals(df_div):
+    """3. 股利計算：回傳 (累積股息, 未使用股息, 各股已領股息表)"""
+    total_div_all, remaining_div, df_div_grouped = 0, 0, pd.DataFrame()
+    if not _usable(df_div): return total_div_all, remaining_div, df_div_grouped
+    if '股票代號' not in df_div.columns or '實領金額' not in df_div.columns:
+        return total_div_all, remaining_div, df_div_grouped
+
+    total_div_all = df_div['實領金額'].sum()
+    if '狀態' in df_div.columns:
+        remaining_div = df_div.loc[df_div['狀態'] == UNUSED, '實領金額'].sum()
+
+    grouped = df_div.groupby('股票代號', observed=True)['實領金額'].sum()
+    df_div_grouped = pd.DataFrame({'股票代號': grouped.index.astype(str), '已領股息': grouped.to_numpy()})
+    return total_div_all, remaining_div, df_div_grouped
+
+def _reconcile(df_dash, df_trans, df_div, df_fund, as_of=None):
+    total_fund_in = fund_total(df_fund)
+    reinvest_dict, total_cash_out, total_cash_rev = trade_flows(df_trans)
+    total_div_all, remaining_div, df_div_grouped = dividend_totals(df_div)
+
+    # 4. 統整持股清單
+    df_stocks = df_dash[df_dash["累積總股數"] > 0]
+
+    # 市值抓不到時以本金代替；股息再投入的部分不算真實投入本金
+    value = df_stocks["目前市值"].mask((df_stocks["目前市值"] == 0) & (df_stocks["總投入本金"] > 0), df_stocks["總投入本金"])
+    reinvest = df_stocks['股票代號'].map(reinvest_dict).fillna(0)
+    cost = (df_stocks['總投入本金'] - reinvest).clip(lower=0)
+    df_stocks = df_stocks.assign(目前市值=value, 再投入金額=reinvest, 總投入本金=cost, 帳面損益=value - cost)
+
+    total_cost = df_stocks["總投入本金"].sum()
+    total_value = df_stocks["目前市值"].sum()
+    total_profit = total_value - total_cost
+
+    if not df_div_grouped.empty:
+        df_stocks = pd.merge(df_stocks, df_div_grouped, on='股票代號', how='left')
+    div = df_stocks['已領股息'].fillna(0) if '已領股息' in df_stocks.columns else pd.Series(0.0, index=df_stocks.index)
+    cost = df_stocks['總投入本金']
+    roi = ((df_stocks['目前市值'] + div - cost) / cost.where(cost > 0) * 100).fillna(0.0)
+    df_stocks = df_stocks.assign(已領股息=div, 含息報酬率=roi)
+
+    # 5. 年化報酬率 (XIRR)：交易、股利的日期與金額，加上今天的市值
+    as_of = pd.Timestamp.now().normalize() if as_of is None else as_of
+    stock_xirr, total_xirr = holding_xirr(cash_flows(df_trans, df_div), df_stocks["股票代號"], df_stocks["目前市值"], as_of)
+    df_stocks = df_stocks.assign(年化報酬率=stock_xirr)
+
+    available_cash = total_fund_in - total_cash_out + total_cash_rev + remaining_div
+    total_profit_with_div = total_profit + total_div_all
+    roi_with_div = (total_profit_with_div / total_cost * 100) if total_cost > 0 else 0
+
+    return Reconciliation(df_stocks, total_cost, total_value, total_profit,
+                          available_cash, total_div_all, remaining_div, roi_with_div, total_xirr)
+
+# ------------------------------------------
+# 以輸入內容的雜湊做記憶化：資料沒變的 rerun 直接取用上次結果
+# ------------------------------------------
+def frame_digest(df):
+    h = hashlib.sha256()
+    if df is None:
+        h.update(b"<none>")
+    else:
+        h.update("\x1f".join(map(str, df.columns)).encode())
+        h.update("\x1f".join(map(str, df.dtypes)).encode())
+        h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()
+
+def memoize_frames(size=8):
+    """依照所有 DataFrame 參數的內容雜湊 (其餘參數照原值) 快取結果 (LRU)；回傳的是 share() 檢視，快取本身不會被呼叫端改到。"""
+    def decorator(fn):
+        memo = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*frames):
+            key = tuple(frame_digest(df) if df is None or isinstance(df, pd.DataFrame) else df for df in frames)
+            with lock:
+                if key in memo:
+                    memo.move_to_end(key)
+                    return share(memo[key])
+            result = fn(*frames)
+            with lock:
+                memo[key] = result
+                while len(memo) > size:
+                    memo.popitem(last=False)
+            return share(result)
+
+        wrapper.cache_clear = memo.clear
+        return wrapper
+    return decorator
+
+@memoize_frames()
+def reconcile(df_dash, df_trans, df_div, df_fund, as_of=None):
+    """由儀表板、交易、股利、資金四張表算出持股清單 df_stocks 與頂部的核心數據。
+
+    as_of 為計算年化報酬率的日期 (預設今天)；傳入時會一併作為快取鍵，換日後自動重算。
+    純函數：不修改傳入的表。相同內容的輸入會直接回傳快取結果 (df_stocks 為共用資料的檢視)。
+    """
+    return _reconcile(df_dash, df_trans, df_div, df_fund, as_of)
+
+# ==========================================
+# 個股明細索引 (持股清單點選後的交易明細 / 領息紀錄)
+# ==========================================
+TRANS_DETAIL_COLS = ["日期", "交易類別", "成交單價", "投入金額", "成交股數", "定期定額", "股息再投入"]
+DIV_DETAIL_COLS = ["發放日期", "季", "配息單價", "實領金額", "狀態"]
+
+StockIndex = namedtuple("StockIndex", ["trans", "div"])
+
+def _check_mark(flags):
+    return pd.Series(np.where(flags, "✔️", "❌"), index=flags.index)
+
+def _group_by_stock(df, cols, sort_col):
+    if sort_col in df.columns:
+        df = df.sort_values(by=sort_col, ascending=True, kind="stable")
+    cols = [c for c in cols if c in df.columns]
+    return {code: sub[cols].reset_index(drop=True) for code, sub in df.groupby("股票代號", sort=False, observed=True)}
+
+def trans_by_stock(df_trans):
+    if not _usable(df_trans) or "股票代號" not in df_trans.columns: return None
+    df = df_trans[df_trans["投入金額"] > 0] if "投入金額" in df_trans.columns else df_trans
+    df = df.assign(**{col: _check_mark(df[col]) for col in ["定期定額", "股息再投入"] if col in df.columns})
+    return _group_by_stock(df, TRANS_DETAIL_COLS, "日期")
+
+def div_by_stock(df_div):
+    if not _usable(df_div) or "股票代號" not in df_div.columns: return None
+    return _group_by_stock(df_div, DIV_DETAIL_COLS, "發放日期")
+
+@memoize_frames()
+def build_stock_index(df_trans, df_div):
+    """載入時整理一次：{股票代號: 已清洗、已排序的明細}，點選個股時只需查表。
+
+    表讀不到或缺少「股票代號」欄位時，對應欄位為 None。
+    """
+    return StockIndex(trans_by_stock(df_trans), div_by_stock(df_div))
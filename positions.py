@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# ==========================================
+# 持股引擎：直接重播交易表 (事件溯源)，逐筆推算股數、成本與已實現損益
+# ==========================================
+POSITIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "positions.json")
+POSITION_COLS = ["股票代號", "持有股數", "持有成本", "平均成本", "已實現損益", "再投入金額"]
+LEDGER_COLS = ["股票代號", "交易類別", "成交股數", "投入金額", "股息再投入"]
+
+def ledger_frame(df_trans):
+    """只留下重播需要的欄位；表讀不到或缺欄位時回傳 None。"""
+    if df_trans is None or df_trans.empty: return None
+    if not set(LEDGER_COLS[:4]) <= set(df_trans.columns): return None
+    return df_trans[[c for c in LEDGER_COLS if c in df_trans.columns]]
+
+def ledger_events(df_trans):
+    """把 (已經過 ingest 整理的) 交易表轉成依寫入順序排列的事件：股票代號、類別、股數、金額、是否股息再投入。"""
+    df = ledger_frame(df_trans)
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["股票代號", "類別", "股數", "金額", "再投入"])
+    kind = df["交易類別"].astype(object)
+    kind = kind.mask(kind.str.contains("分割|配股", na=False), "配股")
+    return pd.DataFrame({
+        "股票代號": df["股票代號"].astype(str),
+        "類別": kind,
+        "股數": df["成交股數"],
+        "金額": df["投入金額"],
+        "再投入": df["股息再投入"] if "股息再投入" in df.columns else False,
+    }).reset_index(drop=True)
+
+class PositionBook:
+    """各股目前狀態：[股數, 持有成本, 已實現損益, 再投入金額]，採平均成本法。"""
+
+    def __init__(self, positions=None):
+        self.positions = positions or {}
+
+    def apply(self, events):
+        for code, kind, shares, amount, reinvest in events.itertuples(index=False, name=None):
+            pos = self.positions.setdefault(code, [0.0, 0.0, 0.0, 0.0])
+            if kind == "買入":
+                pos[0] += shares
+                pos[1] += amount
+                if reinvest: pos[3] += amount
+            elif kind == "賣出":
+                avg = pos[1] / pos[0] if pos[0] > 0 else 0.0
+                cost_out = min(avg * shares, pos[1])
+                pos[0] -= shares
+                pos[1] -= cost_out
+                pos[2] += amount - cost_out
+            elif kind == "配股":
+                pos[0] += shares  # 配股只增加股數，成本不變 → 平均成本下降
+
+    def to_frame(self):
+        if not self.positions:
+            return pd.DataFrame(columns=POSITION_COLS)
+        df = pd.DataFrame([[code, *pos] for code, pos in self.positions.items()],
+                          columns=["股票代號", "持有股數", "持有成本", "已實現損益", "再投入金額"])
+        df["平均成本"] = (df["持有成本"] / df["持有股數"]).where(df["持有股數"] > 0, 0.0)
+        return df[POSITION_COLS].sort_values("股票代號").reset_index(drop=True)
+
+class PositionEngine:
+    """增量更新的持股引擎。
+
+    記住已處理的列數與那一段的內容雜湊 (檢查點)。交易表只是往後新增時，只重播新增的列；
+    若前面的列被修改或刪除，雜湊對不上就從頭重播。檢查點存在硬碟，重開機後不必重播整本帳。
+    """
+
+    def __init__(self, path=POSITIONS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.rows, self.digest, self.book = 0, None, PositionBook()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path): return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.rows, self.digest, self.book = data["rows"], data["digest"], PositionBook(data["positions"])
+        except Exception:
+            self.rows, self.digest, self.book = 0, None, PositionBook()
+
+    def _save(self):
+        if not self.path: return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"rows": self.rows, "digest": self.digest, "positions": self.book.positions}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def update(self, df_trans):
+        """套用交易表中尚未處理的列，回傳每檔股票的持股狀態。
+
+        每次只需對原始欄位做一次向量化雜湊 (確認舊資料沒被改)，清洗與重播都只針對新增的列。
+        交易表這次沒讀到 (None) 時回傳上次的結果，檢查點不動。
+        """
+        if df_trans is None:
+            with self._lock:
+                return self.book.to_frame()
+        ledger = ledger_frame(df_trans)
+        if ledger is None: ledger = pd.DataFrame(columns=LEDGER_COLS)
+        row_hashes = pd.util.hash_pandas_object(ledger, index=False).values
+        with self._lock:
+            if self.rows > len(ledger) or _digest(row_hashes[:self.rows]) != self.digest:
+                self.rows, self.book = 0, PositionBook()  # 舊資料被改過 → 從頭重播
+            if self.rows < len(ledger):
+                self.book.apply(ledger_events(ledger.iloc[self.rows:]))
+                self.rows, self.digest = len(ledger), _digest(row_hashes)
+                self._save()
+            return self.book.to_frame()
+
+def _digest(row_hashes):
+    return hashlib.sha256(np.ascontiguousarray(row_hashes).tobytes()).hexdigest()
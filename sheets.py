@@ -0,0 +1,280 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import closing
+
+import pandas as pd
+
+from http_pool import get_client
+from ingest import SCHEMAS, ingest, share
+
+# ==========================================
+# Google Sheet 讀取 (併發批次載入 + 本機快照)
+# ==========================================
+SHEET_TIMEOUT = 15  # 載入頁面時最多等待秒數 (單次請求的逾時用共用連線池的設定)
+SHEET_TTL = 60      # 記憶體中的資料幾秒後要重新確認
+REFRESH_TICK = 5    # 背景排程多久檢查一次哪些表過期了
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "snapshots.sqlite3")
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="sheet-loader")
+# 背景更新另用一組執行緒，頁面載入不必排在背景下載後面
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sheet-revalidate")
+
+Snapshot = namedtuple("Snapshot", ["frame", "digest", "checked_at"])
+# 單次讀表的紀錄：outcome 為 hit (記憶體) / stale (先給舊資料、背景更新) / disk (硬碟快照) / unchanged (下載但內容沒變) / miss (下載並解析) / error / timeout / local (本機資料庫)
+SheetLoad = namedtuple("SheetLoad", ["outcome", "bytes", "rows", "fetch_s", "parse_s", "seconds"])
+
+_trace = threading.local()
+
+def _note(**kwargs):
+    """記錄到目前執行緒正在追蹤的讀表紀錄 (沒有在追蹤時不做事)。"""
+    current = getattr(_trace, "current", None)
+    if current is not None: current.update(kwargs)
+
+class SnapshotStore:
+    """把每張表下載到的原始 CSV 連同雜湊與抓取時間存進 SQLite，重開機後可直接從硬碟讀出。
+
+    硬碟不能寫 (唯讀或暫存的檔案系統) 時 path 為 None，不存快照，快取只留在記憶體。
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with closing(self._connect()) as conn, conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS snapshots (key TEXT PRIMARY KEY, digest TEXT, fetched_at REAL, content BLOB)")
+        except (OSError, sqlite3.Error):
+            self.path = None
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    @staticmethod
+    def _key(url):
+        # 網址本身是機密，不直接寫進硬碟
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def get(self, url):
+        if self.path is None: return None
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT digest, fetched_at, content FROM snapshots WHERE key = ?", (self._key(url),)).fetchone()
+
+    def put(self, url, digest, fetched_at, content):
+        self._write("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)", (self._key(url), digest, fetched_at, content))
+
+    def touch(self, url, fetched_at):
+        self._write("UPDATE snapshots SET fetched_at = ? WHERE key = ?", (fetched_at, self._key(url)))
+
+    def _write(self, sql, params):
+        # 快照只是備份，寫不進去 (硬碟滿了、檔案被鎖住) 不影響這次讀到的資料
+        if self.path is None: return
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(sql, params)
+        except (OSError, sqlite3.Error):
+            pass
+
+def _download(url):
+    start = time.perf_counter()
+    res = get_client().get(url)
+    res.raise_for_status()
+    _note(bytes=len(res.content), fetch_s=time.perf_counter() - start)
+    return res.content
+
+def _parse(content, schema):
+    """有指定 schema (ingest.SCHEMAS 的表名) 時依欄位定義整理；否則照原樣讀取。"""
+    start = time.perf_counter()
+    df = ingest(content, schema) if schema else pd.read_csv(io.BytesIO(content), dtype={'股票代號': str})
+    _note(parse_s=time.perf_counter() - start)
+    return df
+
+class SheetCache:
+    """程序共用的表格快取 (stale-while-revalidate)。
+
+    - 記憶體內有資料就直接回傳，不論是否過期；過期的表交給背景執行緒重新下載，完成後整份替換。
+    - 背景排程每 REFRESH_TICK 秒檢查一次，把超過 SHEET_TTL 的表先更新好，通常沒有人需要等待下載。
+    - 重新下載後只有內容雜湊變了才重新解析 CSV，並把 version 加一 (頁面據此判斷要不要重跑)。
+    - 程序剛啟動時先回傳硬碟快照；只有記憶體與硬碟都沒有、或寫入後被標記失效的表才會同步下載。
+    """
+
+    def __init__(self, store, ttl=SHEET_TTL, tick=REFRESH_TICK):
+        self.store = store
+        self.ttl = ttl
+        self.tick = tick
+        self._entries = {}
+        self._locks = {}
+        self._pending = set()
+        self._invalid = {}   # key → 標記失效的時間
+        self._known = set()  # 讀過的表，背景排程會持續更新
+        self._guard = threading.Lock()
+        self._scheduler = None
+        self.version = 0     # 有表的內容換新時加一
+
+    def _lock_for(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, url, schema=None):
+        key = (url, schema)
+        self._watch(key)
+        entry = self._entries.get(key)
+        outcome = "stale"
+        if entry is None:
+            entry = self._from_disk(url, schema)
+            if entry is not None:
+                outcome = "disk"
+                self._entries[key] = entry
+                _note(outcome=outcome)
+        if entry is not None and key not in self._invalid:
+            if time.time() - entry.checked_at >= self.ttl:
+                _note(outcome=outcome)
+                self.revalidate(url, schema)
+            return share(entry.frame)
+        return share(self.refresh(url, schema, force=True))
+
+    def _from_disk(self, url, schema):
+        try:
+            row = self.store.get(url)
+            if row is None: return None
+            digest, fetched_at, content = row
+            return Snapshot(_parse(content, schema), digest, fetched_at)
+        except Exception:
+            return None
+
+    def revalidate(self, url, schema=None, force=False):
+        """在背景重新下載 (同一張表同時只會有一個背景工作)，不等待結果。"""
+        key = (url, schema)
+        with self._guard:
+            if key in self._pending: return
+            self._pending.add(key)
+        _refresh_pool.submit(self._revalidate, url, schema, force)
+
+    def _revalidate(self, url, schema, force):
+        try:
+            self.refresh(url, schema, force)
+        finally:
+            self._pending.discard((url, schema))
+
+    def refresh(self, url, schema=None, force=False):
+        """向 Google 重新下載；內容沒變只更新確認時間，不重新解析。下載失敗時沿用舊資料。"""
+        key = (url, schema)
+        with self._lock_for(key):
+            entry = self._entries.get(key)
+            if not force and entry is not None and time.time() - entry.checked_at < self.ttl:
+                _note(outcome="hit")
+                return entry.frame  # 等鎖的期間別人已經更新好了
+            started = time.time()
+            try:
+                content = _download(url)
+                now = time.time()
+                digest = hashlib.sha256(content).hexdigest()
+                changed = entry is None or entry.digest != digest
+                _note(outcome="miss" if changed else "unchanged")
+                entry = Snapshot(_parse(content, schema), digest, now) if changed else entry._replace(checked_at=now)
+                self._entries[key] = entry  # 整份替換，讀取端不會看到做到一半的資料
+                if changed:
+                    with self._guard: self.version += 1
+                # 成功下載才算處理完失效標記，而且只限下載開始前標記的 (下載途中又有新的寫入，就留給下一次)；
+                # 下載失敗時保留標記，下次讀取會再向 Google 確認，不會把寫入前的資料當成最新的
+                if self._invalid.get(key, started + 1) <= started:
+                    self._invalid.pop(key, None)
+                if changed: self.store.put(url, digest, now, content)
+                else: self.store.touch(url, now)
+            except Exception:
+                _note(outcome="error")
+            return None if entry is None else entry.frame
+
+    def invalidate(self, urls=None):
+        """讓指定的表 (預設全部) 在下次讀取時同步向 Google 確認 (寫入後使用)，內容沒變仍不會重新解析。"""
+        now = time.time()
+        for key in list(self._entries):
+            if urls is None or key[0] in urls:
+                self._invalid[key] = now
+
+    def refresh_all(self, urls=None):
+        """在背景重新下載指定的表 (預設全部)，不論是否過期。"""
+        for url, schema in list(self._known):
+            if urls is None or url in urls:
+                self.revalidate(url, schema, force=True)
+
+    def refreshing(self, urls=None):
+        return any(urls is None or key[0] in urls for key in list(self._pending))
+
+    def age(self, urls=None):
+        """指定的表中最舊的一張距離上次成功下載幾秒 (沒有資料時為 None)。"""
+        checked = [e.checked_at for key, e in list(self._entries.items()) if urls is None or key[0] in urls]
+        return time.time() - min(checked) if checked else None
+
+    def _watch(self, key):
+        if key in self._known and self._scheduler is not None: return
+        with self._guard:
+            self._known.add(key)
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(target=self._schedule, name="sheet-refresher", daemon=True)
+                self._scheduler.start()
+
+    def _schedule(self):
+        while True:
+            time.sleep(self.tick)
+            now = time.time()
+            for url, schema in list(self._known):
+                entry = self._entries.get((url, schema))
+                if entry is None or now - entry.checked_at >= self.ttl:
+                    self.revalidate(url, schema)
+
+_cache = SheetCache(SnapshotStore())
+
+def load_data(url, schema=None):
+    return _cache.get(url, schema)
+
+def invalidate_sheets(*urls):
+    _cache.invalidate(set(urls) or None)
+
+def refresh_sheets(*urls):
+    """在背景重新下載 (預設全部)；頁面繼續使用目前的資料，下載完成後自動換成新的。"""
+    _cache.refresh_all(set(urls) or None)
+
+def sheets_refreshing(*urls):
+    return _cache.refreshing(set(urls) or None)
+
+def data_age(*urls):
+    return _cache.age(set(urls) or None)
+
+def data_version():
+    """任何一張表的內容換新時就會變的數字。"""
+    return _cache.version
+
+def _traced_load(url, schema):
+    _trace.current = info = {"outcome": "hit", "bytes": 0, "fetch_s": 0.0, "parse_s": 0.0}
+    start = time.perf_counter()
+    try:
+        frame = load_data(url, schema)
+    finally:
+        _trace.current = None
+    rows = 0 if frame is None else len(frame)
+    return frame, SheetLoad(rows=rows, seconds=time.perf_counter() - start, **info)
+
+def load_sheets(urls, timeout=SHEET_TIMEOUT, stats=None):
+    """同時下載 {名稱: 網址} 的所有表，回傳 {名稱: DataFrame 或 None}。
+
+    名稱是 ingest.SCHEMAS 裡的表名時，會依該表的欄位定義整理 (只做一次，結果隨快取保存)。
+    每張表各自計時，逾時或失敗只會讓該張表變成 None，不影響其他區塊。
+    傳入 stats (dict) 時，會填入每張表的 SheetLoad (快取命中與否、下載位元組、列數、耗時)。
+    """
+    futures = {name: _pool.submit(_traced_load, url, name if name in SCHEMAS else None) for name, url in urls.items()}
+    deadline = time.monotonic() + timeout
+    frames = {}
+    for name, fut in futures.items():
+        try:
+            frames[name], load = fut.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            frames[name], load = None, SheetLoad("timeout", 0, 0, 0.0, 0.0, timeout)
+        except Exception:
+            frames[name], load = None, SheetLoad("error", 0, 0, 0.0, 0.0, 0.0)
+        if stats is not None: stats[name] = load
+    return frames
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 模組都放在專案根目錄 (與 app.py 同層)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
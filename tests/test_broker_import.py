@@ -0,0 +1,31 @@
+import pandas as pd
+
+from broker_import import EXISTING, INVALID, NEW, dedupe, to_trades
+
+def _raw(codes):
+    n = len(codes)
+    return pd.DataFrame({"成交日期": ["113/03/05"] * n, "證券代號": codes, "買賣別": ["現買"] * n,
+                         "成交股數": ["1,000"] * n, "成交價": ["25.5"] * n}, dtype=str)
+
+def test_stock_code_must_be_a_code():
+    trades = to_trades(_raw(["0050", "2330 台積電", "  ", "台積電", None, "00679b"]))
+    assert trades["狀態"].tolist() == [NEW, NEW, INVALID, INVALID, INVALID, NEW]
+    assert trades["股票代號"][trades["狀態"] == NEW].tolist() == ["0050", "2330", "00679B"]
+
+def test_roc_dates_and_amounts():
+    trades = to_trades(_raw(["0056"]))
+    assert trades["日期"].iloc[0] == pd.Timestamp("2024-03-05")
+    assert trades["交易類別"].iloc[0] == "買入"
+    assert trades["投入金額"].iloc[0] == 25500
+
+def test_trades_without_price_or_amount_are_invalid():
+    raw = pd.DataFrame({"成交日期": ["2024-03-05"] * 3, "證券代號": ["0050", "0056", "2330"],
+                        "買賣別": ["買進", "賣出", "配股"], "成交股數": ["100", "100", "20"]}, dtype=str)
+    assert to_trades(raw)["狀態"].tolist() == [INVALID, INVALID, NEW]
+    priced = raw.assign(成交價=["150", "0", "0"])
+    assert to_trades(priced)["狀態"].tolist() == [NEW, INVALID, NEW]
+
+def test_identical_rows_are_deduped_one_for_one():
+    trades = to_trades(_raw(["0056", "0056"]))
+    existing = trades.iloc[:1].drop(columns="狀態")
+    assert dedupe(trades, existing)["狀態"].tolist() == [EXISTING, NEW]
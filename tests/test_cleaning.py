@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning import clean_number, to_number
+
+CELLS = ["1,234", "$1,234.5", " 12 ", "-3.5", "5%", "(1,234)", "", "  ", "-", "#N/A", "nan", None, np.nan,
+         "abc", "1e3", "$-2", "1,2,3"]
+
+def test_to_number_matches_clean_number_cell_by_cell():
+    col = pd.Series(CELLS, dtype=object)
+    expected = col.map(clean_number).astype("float64")
+    pd.testing.assert_series_equal(to_number(col), expected)
+
+@pytest.mark.parametrize("cell, value", [
+    ("1,234", 1234.0), ("$1,234.5", 1234.5), (" 12 ", 12.0), ("-3.5", -3.5), ("$-2", -2.0),
+    # clean_number 不認得百分比與括號負數，一律當 0
+    ("5%", 0.0), ("(1,234)", 0.0),
+    ("", 0.0), ("-", 0.0), ("#N/A", 0.0), (None, 0.0), (np.nan, 0.0),
+])
+def test_to_number_edge_cases(cell, value):
+    assert to_number(pd.Series(["1", cell], dtype=object)).iloc[1] == value
+
+def test_numeric_columns_only_fill_blanks():
+    pd.testing.assert_series_equal(to_number(pd.Series([1, np.nan, 2.5])), pd.Series([1.0, 0.0, 2.5]))
+    assert to_number(pd.Series(["1", "2"], dtype="string")).tolist() == [1.0, 2.0]
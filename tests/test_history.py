@@ -0,0 +1,46 @@
+import pandas as pd
+
+from history import build_history, history_until
+from ingest import SCHEMAS
+
+def _trans(rows):
+    cols = list(SCHEMAS["trans"].columns)
+    df = pd.DataFrame(rows, columns=cols[:7])
+    df["日期"] = pd.to_datetime(df["日期"])
+    df["股票代號"] = df["股票代號"].astype("category")
+    df["交易類別"] = df["交易類別"].astype("category")
+    return df.assign(定期定額=False, 股息再投入=False)
+
+def test_market_value_counts_stocks_not_traded_that_day():
+    trans = _trans([
+        ["2024-01-01", "0050", "買入", 100.0, 10000.0, 100.0, 0.0],
+        ["2024-01-02", "0056", "買入", 50.0, 5000.0, 100.0, 0.0],
+        ["2024-01-04", "0056", "買入", 50.0, 5000.0, 100.0, 0.0],
+    ])
+    history = build_history(trans, None, None)
+    assert history["市值"].tolist() == [10000.0, 15000.0, 15000.0, 20000.0]
+
+def test_sell_reduces_market_value_on_later_days():
+    trans = _trans([
+        ["2024-01-01", "0050", "買入", 100.0, 10000.0, 100.0, 0.0],
+        ["2024-01-02", "0056", "買入", 50.0, 5000.0, 100.0, 0.0],
+        ["2024-01-03", "0050", "賣出", 120.0, 6000.0, 50.0, 0.0],
+    ])
+    history = build_history(trans, None, None)
+    assert history["市值"].tolist() == [10000.0, 15000.0, 11000.0]
+
+def test_history_until_stops_at_day_when_ledger_has_future_rows():
+    trans = _trans([
+        ["2024-01-01", "0050", "買入", 100.0, 10000.0, 100.0, 0.0],
+        ["2024-01-05", "0050", "買入", 100.0, 10000.0, 100.0, 0.0],
+    ])
+    history = history_until(build_history(trans, None, None), pd.Timestamp("2024-01-03"), latest_value=12345.0)
+    assert history.index[-1] == pd.Timestamp("2024-01-03")
+    assert history["市值"].tolist() == [10000.0, 10000.0, 12345.0]
+
+def test_history_until_extends_to_day():
+    trans = _trans([["2024-01-01", "0050", "買入", 100.0, 10000.0, 100.0, 0.0]])
+    cached = build_history(trans, None, None)
+    history = history_until(cached, pd.Timestamp("2024-01-03"), latest_value=11000.0)
+    assert history["市值"].tolist() == [10000.0, 10000.0, 11000.0]
+    assert cached["市值"].tolist() == [10000.0]
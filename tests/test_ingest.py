@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from ingest import ROW_KEY, UNUSED, ingest, share
+
+def _csv(text):
+    return text.encode("utf-8")
+
+def test_trans_columns_get_schema_types():
+    df = ingest(_csv(" 日期 ,股票代號 ,交易類別,成交單價,投入金額,成交股數,手續費,定期定額,股息再投入,備註\n"
+                     "2024/03/05,50,買入 ,150.5,\"15,050\",100,20,✔️,❌,x\n"
+                     "2024/03/06,2330,賣出,600,\"$60,000\",100,#N/A,,Y,y\n"), "trans")
+    assert list(df.columns) == ["日期", "股票代號", "交易類別", "成交單價", "投入金額", "成交股數", "手續費", "定期定額", "股息再投入"]
+    assert df["日期"].tolist() == [pd.Timestamp("2024-03-05"), pd.Timestamp("2024-03-06")]
+    assert isinstance(df["股票代號"].dtype, pd.CategoricalDtype)
+    assert df["股票代號"].tolist() == ["0050", "2330"]
+    assert df["交易類別"].tolist() == ["買入", "賣出"]
+    assert df["投入金額"].tolist() == [15050.0, 60000.0]
+    assert df["手續費"].tolist() == [20.0, 0.0]
+    assert df["定期定額"].tolist() == [True, False] and df["股息再投入"].tolist() == [False, True]
+
+def test_dash_drops_total_rows():
+    df = ingest(_csv("股票代號,總投入本金,目前市值\n0056,1000,1100\n合計,1000,1100\nTotal,1000,1100\n"), "dash")
+    assert df["股票代號"].tolist() == ["0056"]
+    assert df["目前市值"].tolist() == [1100.0]
+
+def test_div_keeps_sheet_row_numbers_and_fills_status():
+    df = ingest(_csv("發放日期,股票代號,季,除息股數,配息單價,實領金額,狀態\n"
+                     "2024-01-10,0050,Q1,1000,1.5,1500,\n"
+                     ",,,,,,\n"
+                     "2024-04-10,0056,Q2,1000,1,1000,領出\n"
+                     ",總計,,,,2500,\n"), "div")
+    assert df[ROW_KEY].tolist() == [2, 4]
+    assert df["狀態"].tolist() == [UNUSED, "領出"]
+
+def test_shared_frames_do_not_leak_changes_back():
+    original = pd.DataFrame({"a": [1.0, 2.0], "b": ["x", "y"]})
+    view = share(original)
+    view["a"] = view["a"] * 10
+    view.loc[0, "b"] = "z"
+    view["c"] = 1
+    assert original["a"].tolist() == [1.0, 2.0] and original["b"].tolist() == ["x", "y"]
+    assert "c" not in original.columns
+    with pytest.raises(ValueError):
+        share(original)["a"].to_numpy()[0] = 5.0
+
+def test_share_reaches_inside_dicts():
+    original = pd.DataFrame({"a": [1]})
+    shared = share({"t": original})
+    assert shared["t"] is not original
+    shared["t"]["a"] = 2
+    assert original["a"].tolist() == [1]
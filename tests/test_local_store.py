@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from ingest import ROW_KEY, UNUSED
+from local_store import LocalStore
+
+def _trade(stock, kind, shares, total, **kwargs):
+    return dict({"action": "trade", "date": "2024-03-05", "stock": stock, "type": kind, "price": total / shares,
+                 "total": total, "shares": shares, "fee": 20, "regular": "❌", "dividend": "❌"}, **kwargs)
+
+def _dividend(stock, total):
+    return {"action": "dividend", "date": "2024-07-01", "stock": stock, "season": "Q2",
+            "held_shares": 1000, "div_price": total / 1000, "total": total}
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalStore(str(tmp_path / "local.sqlite3"))
+
+def test_batch_runs_each_action_and_tags_results(store):
+    result = store.post({"action": "batch", "actions": [
+        {"action": "msg", "date": "2024-03-05", "type": "一般", "content": "hi", "idempotency_key": "a"},
+        {"action": "fund", "date": "2024-03-05", "name": "🐔", "amount": 5000, "idempotency_key": "b"},
+        {"action": "nope", "idempotency_key": "c"},
+    ]})
+    assert [(r["idempotency_key"], r["status"]) for r in result["results"]] == [("a", "success"), ("b", "success"), ("c", "error")]
+    assert store.load("msg")["內容"].tolist() == ["hi"]
+    assert store.load("fund")["金額"].tolist() == [5000.0]
+    assert store.load("act")["類型"].tolist() == ["入金"]
+
+def test_repeated_idempotency_key_is_applied_once(store):
+    first = store.post(dict(_trade("0050", "買入", 100, 15000), idempotency_key="k"))
+    again = store.post(dict(_trade("0050", "買入", 100, 15000), idempotency_key="k"))
+    assert again == first
+    assert len(store.load("trans")) == 1
+    store.post(dict(_trade("0050", "買入", 100, 15000), idempotency_key="other"))
+    assert len(store.load("trans")) == 2
+
+def _update(row):
+    return {"row": int(row[ROW_KEY]), "date": row["發放日期"].strftime("%Y-%m-%d"), "stock": row["股票代號"],
+            "season": row["季"], "amount": float(row["實領金額"])}
+
+def test_bulk_status_update_checks_each_row(store):
+    for stock, total in [("0050", 1000), ("0056", 2000), ("00878", 3000)]:
+        store.post(_dividend(stock, total))
+    unused = store.select("div", 狀態=UNUSED)
+    ok, moved, gone = (_update(r) for _, r in unused.iterrows())
+    moved["amount"] += 100
+    gone["row"] = 99
+    result = store.post({"action": "update_div_status_bulk", "new_status": "領出", "updates": [ok, moved, gone]})
+    assert [(r["row"], r["status"]) for r in result["rows"]] == [(ok["row"], "success"), (moved["row"], "error"), (99, "error")]
+    assert {r["message"] for r in result["rows"][1:]} == {"資料列已變動"}
+    assert store.load("div")["狀態"].astype(str).tolist() == ["領出", UNUSED, UNUSED]
+
+def test_trades_rebuild_dash_with_stored_prices(store):
+    dash = pd.DataFrame({"股票代號": ["0050"], "總投入本金": [0.0], "目前市值": [0.0], "帳面損益": [0.0],
+                         "累積總股數": [0.0], "平均成本": [0.0], "目前股價": [160.0]})
+    store.import_frames({"dash": dash})
+    store.post(_trade("0050", "買入", 100, 15000))
+    store.post(_trade("0056", "買入", 1000, 36000))
+    store.post(_trade("0050", "買入", 100, 17000))
+    rebuilt = store.load("dash").set_index("股票代號")
+    assert rebuilt.loc["0050", ["累積總股數", "總投入本金", "平均成本", "目前市值", "帳面損益"]].tolist() == \
+        [200.0, 32000.0, 160.0, 32000.0, 0.0]
+    assert rebuilt.loc["0056", ["累積總股數", "目前股價", "目前市值"]].tolist() == [1000.0, 0.0, 0.0]
+    store.post(_trade("0056", "賣出", 1000, 40000))
+    assert store.load("dash")["股票代號"].tolist() == ["0050"]
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import positions
+from positions import PositionEngine
+
+def _ledger(n, seed=0):
+    """n 筆隨機交易 (依 ingest 整理後的型別)：幾檔股票輪流買、賣、配股。"""
+    rng = np.random.default_rng(seed)
+    kind = rng.choice(["買入", "買入", "買入", "賣出", "股票分割 (配股)"], n)
+    shares = rng.integers(1, 50, n) * 10.0
+    return pd.DataFrame({
+        "日期": pd.date_range("2020-01-01", periods=n, freq="h"),
+        "股票代號": pd.Categorical(rng.choice(["0050", "0056", "00878", "2330"], n)),
+        "交易類別": pd.Categorical(kind),
+        "投入金額": np.where(kind == "股票分割 (配股)", 0.0, shares * rng.uniform(20, 600, n).round(2)),
+        "成交股數": shares,
+        "股息再投入": rng.random(n) < 0.2,
+    })
+
+def _full(df):
+    return PositionEngine(path=None).update(df)
+
+@pytest.fixture
+def replayed(monkeypatch):
+    """記錄每次重播了幾列。"""
+    sizes = []
+    events = positions.ledger_events
+    monkeypatch.setattr(positions, "ledger_events", lambda df: sizes.append(len(df)) or events(df))
+    return sizes
+
+def test_appended_rows_are_replayed_incrementally(tmp_path, replayed):
+    ledger = _ledger(5000)
+    engine = PositionEngine(path=str(tmp_path / "positions.json"))
+    engine.update(ledger.iloc[:3000])
+    result = engine.update(ledger)
+    assert replayed == [3000, 2000]
+    pd.testing.assert_frame_equal(result, _full(ledger))
+
+def test_unchanged_ledger_replays_nothing(tmp_path, replayed):
+    ledger = _ledger(100)
+    engine = PositionEngine(path=str(tmp_path / "positions.json"))
+    first = engine.update(ledger)
+    pd.testing.assert_frame_equal(engine.update(ledger), first)
+    assert replayed == [100]
+
+def test_edited_row_rebuilds_from_scratch(tmp_path, replayed):
+    ledger = _ledger(5000)
+    engine = PositionEngine(path=str(tmp_path / "positions.json"))
+    engine.update(ledger)
+    edited = ledger.copy()
+    edited.loc[10, "成交股數"] += 10
+    result = engine.update(edited)
+    assert replayed == [5000, 5000]
+    pd.testing.assert_frame_equal(result, _full(edited))
+
+def test_shrunk_ledger_rebuilds_from_scratch(tmp_path, replayed):
+    ledger = _ledger(5000)
+    engine = PositionEngine(path=str(tmp_path / "positions.json"))
+    engine.update(ledger)
+    result = engine.update(ledger.iloc[:4000])
+    assert replayed == [5000, 4000]
+    pd.testing.assert_frame_equal(result, _full(ledger.iloc[:4000]))
+
+def test_checkpoint_survives_a_restart(tmp_path, replayed):
+    ledger = _ledger(5000)
+    path = str(tmp_path / "positions.json")
+    PositionEngine(path=path).update(ledger.iloc[:4500])
+    restarted = PositionEngine(path=path)
+    assert restarted.rows == 4500
+    result = restarted.update(ledger)
+    assert replayed == [4500, 500]
+    pd.testing.assert_frame_equal(result, _full(ledger))
+
+def test_corrupt_checkpoint_is_ignored(tmp_path):
+    path = tmp_path / "positions.json"
+    path.write_text("{not json", encoding="utf-8")
+    ledger = _ledger(100)
+    pd.testing.assert_frame_equal(PositionEngine(path=str(path)).update(ledger), _full(ledger))
+
+def test_missing_ledger_keeps_the_book(tmp_path, replayed):
+    ledger = _ledger(1000)
+    engine = PositionEngine(path=str(tmp_path / "positions.json"))
+    first = engine.update(ledger)
+    pd.testing.assert_frame_equal(engine.update(None), first)
+    pd.testing.assert_frame_equal(engine.update(ledger), first)
+    assert replayed == [1000]
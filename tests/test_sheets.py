@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+import sheets
+from sheets import SheetCache, SnapshotStore
+
+CSV = "日期,類型,內容\n2024-01-01,一般,hi\n".encode()
+
+@pytest.fixture
+def cache(tmp_path):
+    return SheetCache(SnapshotStore(str(tmp_path / "snapshots.sqlite3")), ttl=0, tick=3600)
+
+def _wait(cache):
+    deadline = time.time() + 5
+    while cache.refreshing() and time.time() < deadline:
+        time.sleep(0.01)
+
+def test_version_changes_only_when_content_changes(cache, monkeypatch):
+    content = [CSV]
+    monkeypatch.setattr(sheets, "_download", lambda url: content[0])
+    cache.get("http://msg", "msg")
+    version = cache.version
+    cache.revalidate("http://msg", "msg")
+    _wait(cache)
+    assert cache.version == version
+    content[0] = CSV + "2024-01-02,一般,again\n".encode()
+    cache.revalidate("http://msg", "msg")
+    _wait(cache)
+    assert cache.version == version + 1
+
+def test_page_loads_do_not_wait_for_background_refreshes(cache, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(sheets, "_cache", cache)
+    monkeypatch.setattr(sheets, "_download", lambda url: CSV if "page" in url else release.wait(5) and CSV)
+    try:
+        for i in range(16):
+            cache.revalidate(f"http://slow{i}", "msg")
+        start = time.monotonic()
+        frames = sheets.load_sheets({"msg": "http://page"}, timeout=2)
+        assert frames["msg"] is not None and time.monotonic() - start < 1
+    finally:
+        release.set()
+
+def test_unwritable_snapshot_path_falls_back_to_memory(tmp_path, monkeypatch):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    store = SnapshotStore(str(blocker / "cache" / "snapshots.sqlite3"))
+    assert store.path is None
+    monkeypatch.setattr(sheets, "_download", lambda url: CSV)
+    cache = SheetCache(store, ttl=60, tick=3600)
+    assert cache.get("http://msg", "msg")["內容"].tolist() == ["hi"]
+
+def test_failed_download_keeps_the_sheet_invalid(cache, monkeypatch):
+    monkeypatch.setattr(sheets, "_download", lambda url: CSV)
+    cache.get("http://msg", "msg")
+    cache.invalidate()
+
+    def down(url): raise OSError("offline")
+    monkeypatch.setattr(sheets, "_download", down)
+    assert cache.get("http://msg", "msg")["內容"].tolist() == ["hi"]
+    assert ("http://msg", "msg") in cache._invalid
+    monkeypatch.setattr(sheets, "_download", lambda url: CSV)
+    cache.get("http://msg", "msg")
+    assert not cache._invalid
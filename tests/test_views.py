@@ -0,0 +1,20 @@
+import pandas as pd
+
+from ingest import ROW_KEY
+from views import selected_rows, table_key
+
+def _unused(rows):
+    return pd.DataFrame({ROW_KEY: rows, "實領金額": [100.0 * r for r in rows]})
+
+def test_table_key_changes_with_the_rows():
+    df = _unused([2, 3, 4])
+    assert table_key("t", df) == table_key("t", _unused([2, 3, 4]))
+    assert table_key("t", df) != table_key("t", _unused([2, 3]))
+    assert table_key("t", df) != table_key("t", df.assign(實領金額=[1.0, 2.0, 3.0]))
+
+def test_selected_rows_resolve_through_the_row_key():
+    df = _unused([2, 5, 9])
+    assert selected_rows(df, [0, 2], ROW_KEY)[ROW_KEY].tolist() == [2, 9]
+
+def test_selected_rows_ignore_positions_past_the_end():
+    assert selected_rows(_unused([2, 5]), [1, 20, 21], ROW_KEY)[ROW_KEY].tolist() == [5]
@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+import writer
+from writer import DONE, FAILED, WriteQueue
+
+class _Response:
+    def __init__(self, status, data, headers=None):
+        self.status_code, self._data, self.headers = status, data, headers or {}
+
+    def json(self):
+        if self._data is None: raise ValueError("not json")
+        return self._data
+
+class _Client:
+    """依序回傳 / 丟出 outcomes 裡的結果，並記錄 POST 與 GET (跟轉址) 各送了幾次。"""
+
+    def __init__(self, *outcomes):
+        self.outcomes, self.posts, self.gets = list(outcomes), 0, 0
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        return self._next()
+
+    def get(self, url, **kwargs):
+        self.gets += 1
+        return self._next()
+
+    def _next(self):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception): raise outcome
+        return outcome
+
+def _refused():
+    return requests.ConnectionError(MaxRetryError(None, "/exec", NewConnectionError(None, "refused")))
+
+_REDIRECT = _Response(302, None, {"Location": "http://echo"})
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(writer, "BACKOFF", 0)
+
+def _run(monkeypatch, client, **kwargs):
+    monkeypatch.setattr(writer, "get_client", lambda: client)
+    q = WriteQueue("http://gas", **kwargs)
+    job = q.submit({"action": "trade"}, "交易")
+    deadline = time.time() + 5
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    return q, job
+
+@pytest.mark.parametrize("error", [_refused(), requests.ConnectTimeout("slow")])
+def test_failed_connects_are_retried(monkeypatch, error):
+    client = _Client(error, _Response(200, {"status": "success"}))
+    _, job = _run(monkeypatch, client)
+    assert (job.status, client.posts) == (DONE, 2)
+
+def test_redirect_is_followed_with_a_get(monkeypatch):
+    client = _Client(_REDIRECT, _Response(200, {"status": "success"}))
+    _, job = _run(monkeypatch, client)
+    assert (job.status, client.posts, client.gets) == (DONE, 1, 1)
+
+@pytest.mark.parametrize("outcome", [_refused(), _Response(429, None)])
+def test_failed_redirect_is_not_resent(monkeypatch, outcome):
+    client = _Client(_REDIRECT, outcome, _REDIRECT, _Response(200, {"status": "success"}))
+    _, job = _run(monkeypatch, client)
+    assert (job.status, client.posts, client.gets) == (FAILED, 1, 1)
+
+@pytest.mark.parametrize("outcome", [requests.ReadTimeout("slow"), requests.ConnectionError("reset"), _Response(500, None)])
+def test_possibly_delivered_writes_are_not_resent(monkeypatch, outcome):
+    client = _Client(outcome, _Response(200, {"status": "success"}))
+    _, job = _run(monkeypatch, client)
+    assert (job.status, client.posts) == (FAILED, 1)
+
+def test_idempotent_script_retries_read_timeouts(monkeypatch):
+    client = _Client(requests.ReadTimeout("slow"), _Response(200, {"status": "success"}))
+    _, job = _run(monkeypatch, client, idempotent=True)
+    assert (job.status, client.posts) == (DONE, 2)
+
+def test_html_error_page_is_a_failure(monkeypatch):
+    _, job = _run(monkeypatch, _Client(_Response(200, None)))
+    assert job.status == FAILED
+
+def test_worker_survives_transport_errors(monkeypatch):
+    q, job = _run(monkeypatch, _Client(KeyError("row")))
+    assert job.status == FAILED and q._worker.is_alive()
+
+def test_full_queue_leaves_no_phantom_job():
+    release = threading.Event()
+    q = WriteQueue("http://gas", maxsize=1, transport=lambda body: release.wait(5) and {"status": "success"})
+    try:
+        first = q.submit({"action": "msg"}, "公告")
+        deadline = time.time() + 5
+        while q._queue.qsize() and time.time() < deadline:
+            time.sleep(0.01)  # 等工作執行緒拿走第一筆
+        assert q.free() == 1
+        second = q.submit({"action": "msg"}, "公告")
+        assert q.free() == 0
+        with pytest.raises(queue.Full):
+            q.submit({"action": "msg"}, "公告")
+        assert q.jobs() == [first, second]
+    finally:
+        release.set()
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from xirr import MAX_RATE, MIN_RATE, holding_xirr
+
+AS_OF = pd.Timestamp("2024-12-31")
+
+def _flows(rows):
+    return pd.DataFrame({"股票代號": [r[0] for r in rows], "日期": pd.to_datetime([r[1] for r in rows]),
+                         "金額": [float(r[2]) for r in rows]})
+
+def _reference(dates, amounts):
+    """逐組暴力解：在 (MIN_RATE, MAX_RATE) 上密集取點找變號，再二分到底；沒有變號為 NaN。"""
+    t = (pd.to_datetime(dates) - pd.to_datetime(dates).min()).days.to_numpy() / 365.0
+    c = np.asarray(amounts, dtype=float)
+    npv = lambda r: (c * (1 + r) ** -t).sum()
+    grid = np.expm1(np.linspace(np.log1p(MIN_RATE), np.log1p(MAX_RATE), 4001))
+    values = np.array([npv(r) for r in grid])
+    cross = np.flatnonzero(np.sign(values[:-1]) != np.sign(values[1:]))
+    if len(cross) == 0: return np.nan
+    lo, hi = grid[cross[0]], grid[cross[0] + 1]
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        lo, hi = (mid, hi) if np.sign(npv(mid)) == np.sign(npv(lo)) else (lo, mid)
+    return (lo + hi) / 2 * 100
+
+def _expected(flows, codes, values):
+    per_code = []
+    for code, value in zip(codes, values):
+        own = flows[flows["股票代號"] == code]
+        per_code.append(_reference(list(own["日期"]) + [AS_OF], list(own["金額"]) + [value]))
+    total = _reference(list(flows["日期"]) + [AS_OF], list(flows["金額"]) + [sum(values)])
+    return np.array(per_code), total
+
+def test_holding_without_cash_flows_is_nan():
+    flows = _flows([("0050", "2023-01-03", -1000), ("0050", "2024-01-03", -100)])
+    rates, total = holding_xirr(flows, ["0050", "0056"], [1100, 500], AS_OF)
+    assert np.isnan(rates[1])
+    assert rates[0] == pytest.approx(_expected(flows, ["0050"], [1100])[0][0], abs=1e-6)
+
+def test_groups_with_only_inflows_or_outflows_are_nan():
+    # 只有配股 / 股利 (全是流入) 或市值為 0 的持股 (全是流出) 都沒有解
+    flows = _flows([("0056", "2024-06-01", 30), ("00878", "2024-03-01", -500)])
+    rates, total = holding_xirr(flows, ["0050", "0056", "00878"], [800, 600, 0], AS_OF)
+    assert np.isnan(rates).all()
+    assert total == pytest.approx(_reference(["2024-06-01", "2024-03-01", AS_OF], [30, -500, 1400]), abs=1e-6)
+
+def test_duplicate_codes_share_one_rate():
+    flows = _flows([("0050", "2023-01-03", -1000), ("0056", "2023-06-01", -500)])
+    rates, total = holding_xirr(flows, ["0050", "0056", "0050"], [700, 520, 400], AS_OF)
+    expected, expected_total = _expected(flows, ["0050", "0056"], [1100, 520])
+    np.testing.assert_allclose(rates, expected[[0, 1, 0]], rtol=1e-6)
+    assert total == pytest.approx(expected_total, rel=1e-6)
+
+def test_empty_ledger_is_nan():
+    rates, total = holding_xirr(_flows([]), ["0050", "0056"], [1100, 500], AS_OF)
+    assert np.isnan(rates).all() and np.isnan(total)
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(7)
+    codes = [f"{i:04d}" for i in range(1, 41)]
+    rows = []
+    for code in codes:
+        for day in rng.choice(pd.date_range("2019-01-01", "2024-12-01").to_numpy(), rng.integers(1, 30)):
+            rows.append((code, day, -rng.uniform(1000, 20000)))
+        if rng.random() < 0.3:
+            rows.append((code, pd.Timestamp("2024-06-01"), rng.uniform(100, 5000)))
+    flows = _flows(rows)
+    invested = flows[flows["金額"] < 0].groupby("股票代號")["金額"].sum().reindex(codes).fillna(0).abs().to_numpy()
+    values = invested * rng.uniform(0.05, 3.0, len(codes))  # 包含大賠與大賺
+    rates, total = holding_xirr(flows, codes, values, AS_OF)
+    expected, expected_total = _expected(flows, codes, values)
+    np.testing.assert_allclose(rates, expected, rtol=1e-6, atol=1e-6)
+    assert total == pytest.approx(expected_total, rel=1e-6)
+
+def test_reconcile_with_duplicate_dashboard_rows():
+    from portfolio import reconcile
+    dash = pd.DataFrame({"股票代號": ["0050", "0050"], "總投入本金": [1000.0, 0.0], "目前市值": [700.0, 400.0],
+                         "帳面損益": [-300.0, 400.0], "累積總股數": [10.0, 4.0], "平均成本": [100.0, 0.0],
+                         "目前股價": [110.0, 110.0]})
+    trans = pd.DataFrame({"日期": pd.to_datetime(["2023-01-03"]), "股票代號": pd.Categorical(["0050"]),
+                          "交易類別": pd.Categorical(["買入"]), "成交單價": [100.0], "投入金額": [1000.0],
+                          "成交股數": [10.0], "手續費": [0.0], "定期定額": [False], "股息再投入": [False]})
+    recon = reconcile(dash, trans, None, None, AS_OF)
+    assert recon.df_stocks["年化報酬率"].nunique() == 1
@@ -0,0 +1,114 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+from streamlit import column_config
+
+# ==========================================
+# 畫面用的表格整理 (不需要 streamlit 執行環境，方便效能測試)
+# ==========================================
+HOLDING_COLS = ["股票代號", "目前市值", "帳面損益", "已領股息", "含息報酬率", "年化報酬率", "總投入本金", "目前股價", "累積總股數"]
+PAGE_SIZE = 50  # 明細表每頁筆數
+TRADE_MARKS = {"買入": "🔴 買入", "賣出": "🟢 賣出"}
+STATUS_MARKS = {"未使用": "🟡 未使用", "再投入股票": "🟢 再投入股票", "領出": "🔴 領出"}
+
+def holdings_frame(df_stocks, stock_map, positions):
+    """持股清單要顯示的欄位：股票代號附上名稱，並帶入持股引擎算出的已實現損益。"""
+    display_df = df_stocks[HOLDING_COLS].copy()
+    display_df.insert(4, "已實現損益", display_df["股票代號"].map(positions["已實現損益"]).fillna(0))
+    display_df["顯示名稱"] = display_df["股票代號"].map(stock_map).fillna("")
+    display_df["股票代號"] = display_df.apply(lambda x: f"{x['股票代號']} ({x['顯示名稱']})" if x['顯示名稱'] else x['股票代號'], axis=1)
+    return display_df.drop(columns=["顯示名稱"])
+
+def style_row(row):
+    color = '#ff2b2b' if row['含息報酬率'] > 0 else '#09ab3b' if row['含息報酬率'] < 0 else 'black'
+    return [f'color: {color}; font-weight: bold' if col in ['帳面損益', '含息報酬率'] else '' for col in row.index]
+
+def holdings_styler(display_df):
+    return display_df.style.format({
+        "總投入本金": "{:,.0f}",
+        "目前市值": "{:,.0f}",
+        "帳面損益": "{:,.0f}",
+        "已領股息": "{:,.0f}",
+        "已實現損益": "{:,.0f}",
+        "含息報酬率": "{:.2f}%",
+        "年化報酬率": "{:.2f}%",
+        "目前股價": "{:.2f}",
+        "累積總股數": "{:,.0f}"
+    }, na_rep="-").apply(style_row, axis=1).bar(subset=['含息報酬率'], align='mid', color=['#90EE90', '#FFB6C1'])
+
+def _day(d): return d.strftime('%Y-%m-%d') if pd.notna(d) else ''
+
+def highlight(v): return 'color: #ff2b2b; font-weight: bold' if v=='買入' else 'color: #09ab3b; font-weight: bold' if v=='賣出' else ''
+
+def trans_styler(my_trans):
+    return my_trans.style.map(highlight, subset=['交易類別']).format({"日期": _day, "成交單價": "{:.2f}", "投入金額": "{:,.0f}", "成交股數": "{:,.0f}"})
+
+def style_status(v):
+    if v == '未使用': return 'background-color: #ffeebb; color: black;'
+    if v == '再投入股票': return 'background-color: #ccffcc; color: black;'
+    if v == '領出': return 'background-color: #ffcccc; color: black;'
+    return ''
+
+def div_styler(my_div):
+    styler = my_div.style
+    if "狀態" in my_div.columns:
+        styler = styler.map(style_status, subset=['狀態'])
+    return styler.format({"發放日期": _day, "配息單價": "{:.2f}", "實領金額": "{:,.0f}"})
+
+# ------------------------------------------
+# 快速模式：事先算好顯示欄位，交給 st.column_config 格式化，不經過逐列的 Styler
+# ------------------------------------------
+def _number(fmt):
+    return column_config.NumberColumn(format=fmt)
+
+_DATE = column_config.DateColumn(format="YYYY-MM-DD")
+
+def trend_mark(values):
+    """紅漲綠跌的標記 (與 style_row 相同：依含息報酬率正負)。"""
+    return np.select([values > 0, values < 0], ["🔴", "🟢"], "⚪")
+
+def holdings_view(display_df):
+    """回傳 (表格, 欄位設定)：金額先四捨五入成整數，報酬率以進度條呈現 (正紅負綠)。"""
+    df = display_df.copy()
+    money = ["總投入本金", "目前市值", "帳面損益", "已領股息", "已實現損益", "累積總股數"]
+    df[money] = df[money].round(0)
+    df.insert(1, "漲跌", trend_mark(df["含息報酬率"]))
+    bound = max(float(df["含息報酬率"].abs().max()), 1.0) if not df.empty else 1.0
+    config = {col: _number("%,d") for col in money}
+    config.update({"漲跌": column_config.TextColumn(width="small"), "目前股價": _number("%.2f"),
+                   "年化報酬率": column_config.NumberColumn(format="%.2f%%", help="依每筆投入時間加權的年化報酬率 (XIRR)"),
+                   "含息報酬率": column_config.ProgressColumn(format="%.2f%%", min_value=-bound, max_value=bound, color="auto-inverse")})
+    return df, config
+
+def trans_view(my_trans):
+    df = my_trans.copy()
+    if "交易類別" in df.columns:
+        kind = df["交易類別"].astype(object)
+        df["交易類別"] = kind.map(TRADE_MARKS).fillna(kind)
+    whole = [c for c in ["投入金額", "成交股數"] if c in df.columns]
+    df[whole] = df[whole].round(0)
+    return df, {"日期": _DATE, "成交單價": _number("%.2f"), "投入金額": _number("%,d"), "成交股數": _number("%,d")}
+
+def div_view(my_div):
+    df = my_div.copy()
+    if "狀態" in df.columns:
+        status = df["狀態"].astype(object)
+        df["狀態"] = status.map(STATUS_MARKS).fillna(status)
+    if "實領金額" in df.columns:
+        df["實領金額"] = df["實領金額"].round(0)
+    return df, {"發放日期": _DATE, "配息單價": _number("%.2f"), "實領金額": _number("%,d")}
+
+def page_of(df, page, page_size=PAGE_SIZE):
+    """第 page 頁 (從 1 開始) 的資料。"""
+    return df.iloc[(page - 1) * page_size: page * page_size]
+
+def table_key(name, df):
+    """可勾選表格的 widget key：帶上資料內容的雜湊，資料一變就是新的表格，舊的勾選不會留下來套到別的列。"""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()[:16]
+    return f"{name}_{digest}"
+
+def selected_rows(df, rows, key_col):
+    """表格勾選的位置 → 對應的資料列 (依 key_col 對回原表，超出範圍的位置略過)。"""
+    keys = df[key_col].iloc[[i for i in rows if 0 <= i < len(df)]]
+    return df[df[key_col].isin(keys)]
@@ -0,0 +1,200 @@
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from http_pool import get_client
+
+# ==========================================
+# Apps Script 寫入佇列 (背景送出 + 批次 + 重試)
+# ==========================================
+MAX_ATTEMPTS = 4     # 含第一次，共嘗試幾次
+BACKOFF = 1.5        # 重試間隔：1.5s、3s、6s …
+BATCH_SIZE = 20      # 一次批次最多帶幾筆
+REDIRECTS = (301, 302, 303)
+
+QUEUED, SENDING, RETRYING, DONE, FAILED = "排隊中", "傳送中", "重試中", "成功", "失敗"
+
+@dataclass
+class WriteJob:
+    payload: dict
+    label: str
+    invalidate: tuple = ()
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    attempts: int = 0
+    message: str = ""
+    created_at: float = field(default_factory=time.time)
+    done_at: float = None
+    rows: dict = field(default_factory=dict)  # 多列動作：{列號: (成功與否, 訊息)}
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def failed_rows(self):
+        return [row for row, (ok, _) in self.rows.items() if not ok]
+
+class RetryableError(Exception):
+    pass
+
+class UnconfirmedError(Exception):
+    """請求可能已送達 (讀取逾時、5xx)，但 Apps Script 不保證依 idempotency_key 去重，不能重送。"""
+
+class WriteQueue:
+    """把寫入動作排進背景佇列，由單一工作執行緒依序送給 Apps Script。
+
+    每筆動作都帶 idempotency_key。預設只重試確定沒送到的請求 (連線沒建立、429)；
+    Apps Script 會依 idempotency_key 略過已寫入的資料列時設 idempotent=True，讀取逾時與 5xx 才會重試。
+    batch=True 時，同時排隊的多筆動作會包成一個 {"action": "batch", "actions": [...]} 送出。
+    一個動作改多列時，回應可帶 "rows": [{"row": 列號, "status": ..., "message": ...}]，
+    逐列結果存在 job.rows；只要有一列成功就算完成 (表已變動)，失敗的列寫在 message。
+    傳入 transport (收 body、回傳與 Apps Script 相同格式的 dict) 時改由它處理，不發 HTTP 請求。
+    回應不是 JSON (例如 doPost 出錯時的 HTML 錯誤頁) 一律算失敗；舊版只回純文字的 Apps Script 要設 plain_text=True。
+    """
+
+    def __init__(self, url, batch=False, on_success=None, maxsize=200, history=200, transport=None, plain_text=False,
+                 idempotent=False):
+        self.url = url
+        self.batch = batch
+        self.idempotent = idempotent
+        self.plain_text = plain_text
+        self.transport = transport
+        self.on_success = on_success
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._history = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="gas-writer", daemon=True)
+        self._worker.start()
+
+    def submit(self, payload, label, invalidate=()):
+        """排入一筆寫入，回傳 WriteJob；佇列已滿時丟出 queue.Full。"""
+        job = WriteJob(payload=payload, label=label, invalidate=tuple(invalidate))
+        self._queue.put_nowait(job)  # 先排進佇列，排不進去的不會留在紀錄裡
+        with self._lock:
+            self._history.append(job)
+        return job
+
+    def free(self):
+        """佇列還能再排幾筆。"""
+        return self._queue.maxsize - self._queue.qsize()
+
+    def jobs(self, ids=None):
+        with self._lock:
+            jobs = list(self._history)
+        return jobs if ids is None else [j for j in jobs if j.id in ids]
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            while len(jobs) < BATCH_SIZE:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if self.batch and len(jobs) > 1:
+                self._send(jobs)
+            else:
+                for job in jobs:
+                    self._send([job])
+
+    def _send(self, jobs):
+        # 工作執行緒整個程序只有一條，任何例外都只讓這次的動作失敗，不能讓執行緒結束
+        try:
+            self._deliver(jobs)
+        except Exception as e:
+            message = str(e) if isinstance(e, UnconfirmedError) else f"寫入時發生錯誤：{e}"
+            for job in jobs:
+                if not job.finished:
+                    job.status, job.message, job.done_at = FAILED, message, time.time()
+
+    def _deliver(self, jobs):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            for job in jobs:
+                job.status, job.attempts = SENDING, attempt
+            try:
+                results = self._post(jobs)
+                break
+            except RetryableError as e:
+                if attempt == MAX_ATTEMPTS:
+                    results = {job.id: (False, str(e), {}) for job in jobs}
+                    break
+                for job in jobs:
+                    job.status, job.message = RETRYING, str(e)
+                time.sleep(BACKOFF * 2 ** (attempt - 1))
+        for job in jobs:
+            ok, message, job.rows = results.get(job.id, (False, "Apps Script 沒有回報這筆結果", {}))
+            job.status, job.message, job.done_at = (DONE if ok else FAILED), message, time.time()
+            if ok and self.on_success:
+                try:
+                    self.on_success(job)
+                except Exception:
+                    pass
+
+    def _post(self, jobs):
+        """送出一次請求，回傳 {job.id: (成功與否, 訊息, 逐列結果)}；可以安全重送時丟出 RetryableError。"""
+        actions = [dict(job.payload, idempotency_key=job.id) for job in jobs]
+        body = actions[0] if len(actions) == 1 else {"action": "batch", "actions": actions}
+        status, data = (200, self.transport(body)) if self.transport else self._request(body)
+        if status != 200:
+            return {job.id: (False, f"Apps Script 回應 {status}", {}) for job in jobs}
+        if len(jobs) == 1:
+            return {jobs[0].id: _result(data, self.plain_text)}
+        if not isinstance(data, dict):
+            return {job.id: _result(data, self.plain_text) for job in jobs}
+        by_key = {r.get("idempotency_key"): r for r in data.get("results", []) if isinstance(r, dict)}
+        return {job.id: _result(by_key[job.id]) for job in jobs if job.id in by_key}
+
+    def _request(self, body):
+        # Apps Script 收到 POST 時就寫入，再 302 轉到 googleusercontent.com 取回應；
+        # 轉址自己跟，第二跳失敗時資料已寫入，不能整個重送
+        client = get_client()
+        try:
+            res = client.post(self.url, json=body, allow_redirects=False)
+        except requests.RequestException as e:
+            if _never_sent(e): raise RetryableError(f"連線錯誤：{e}")
+            self._unconfirmed(e)
+        if res.status_code == 429 or (res.status_code >= 500 and self.idempotent):
+            raise RetryableError(f"Apps Script 回應 {res.status_code}")
+        if res.status_code in REDIRECTS and "Location" in res.headers:
+            try:
+                res = client.get(res.headers["Location"])
+            except requests.RequestException as e:
+                self._unconfirmed(e)
+            if res.status_code >= 500 and self.idempotent:
+                raise RetryableError(f"Apps Script 回應 {res.status_code}")
+        try:
+            return res.status_code, res.json()
+        except ValueError:
+            return res.status_code, None
+
+    def _unconfirmed(self, e):
+        if self.idempotent: raise RetryableError(f"沒有收到回應：{e}")
+        raise UnconfirmedError(f"沒有收到回應，資料可能已寫入，請先確認表格再決定是否重送 ({e})")
+
+def _never_sent(e):
+    """連線根本沒建立 (連線逾時、拒絕連線、找不到主機)，請求一定沒送出。"""
+    if isinstance(e, requests.ConnectTimeout): return True
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(reason, NewConnectionError)
+
+def _result(data, plain_text=False):
+    if data is None:
+        return (True, "", {}) if plain_text else (False, "Apps Script 回應不是 JSON (可能是錯誤頁)", {})
+    if not isinstance(data, dict):
+        return False, f"Apps Script 回應格式不符：{str(data)[:80]}", {}
+    rows = {r.get("row"): (r.get("status") == "success", r.get("message", ""))
+            for r in data.get("rows", []) if isinstance(r, dict)}
+    if rows:
+        failed = [f"第 {row} 列：{msg or '失敗'}" for row, (ok, msg) in rows.items() if not ok]
+        ok_count = len(rows) - len(failed)
+        return ok_count > 0, "；".join([f"{ok_count}/{len(rows)} 筆成功"] + failed), rows
+    if "status" not in data:
+        return True, "", {}
+    return data["status"] == "success", data.get("message", ""), {}
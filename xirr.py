@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 年化報酬率 (XIRR)：依每筆現金流的日期計算的資金加權報酬率
+# 所有持股與整體投資組合一起解：每一輪牛頓法都是整批陣列運算，不逐檔呼叫求根函式
+# ==========================================
+MAX_ITER = 8       # 第一輪牛頓法輪數 (起始值合理時通常 5 輪內收斂，其餘交給二分法夾住後再解)
+BRACKET = 1e-3     # 牛頓法沒收斂的組先用二分法把 ln(1+r) 夾到這個寬度內，再交回牛頓法
+BISECT_ITER = 60   # 二分法最多幾輪
+TOL = 1e-9
+MIN_RATE, MAX_RATE = -0.9999, 100.0  # 每年 -99.99% ~ +10000%，超出範圍視為沒有合理解
+GUESS_RANGE = (-0.5, 2.0)  # 起始值限制在 -50% ~ +200%：太極端的起始值會落在指數項主導的平坦區，牛頓法走得很慢
+
+def _guess(amounts, years, groups, n_groups):
+    """起始值：流入 / 流出總額的比例，攤在兩者依金額加權的平均時間差上 (單筆投入、單筆回收時即為解)。"""
+    inflow, outflow = np.where(amounts > 0, amounts, 0.0), np.where(amounts < 0, -amounts, 0.0)
+    total_in, total_out = np.bincount(groups, inflow, n_groups), np.bincount(groups, outflow, n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        span = np.bincount(groups, inflow * years, n_groups) / total_in - np.bincount(groups, outflow * years, n_groups) / total_out
+        x = np.log(total_in / total_out) / np.maximum(span, 1 / 365)
+    return np.clip(np.nan_to_num(x, nan=0.1, posinf=0.1, neginf=0.1), *np.log1p(GUESS_RANGE))
+
+class _Flows:
+    """以 x = ln(1+r) 表示的整批現金流：npv(x) = Σ c·e^(-x·t)，各組一起算。"""
+
+    def __init__(self, amounts, years, groups, n_groups):
+        self.c, self.t, self.g, self.n = amounts, years, groups, n_groups
+
+    def npv(self, x):
+        return np.bincount(self.g, self.c * np.exp(-x[self.g] * self.t), self.n)
+
+    def newton(self, x, todo, low, high):
+        """對 todo 的組做牛頓法，回傳 (x, 已收斂)。"""
+        done = ~todo
+        for _ in range(MAX_ITER):
+            if done.all(): break
+            disc = self.c * np.exp(-x[self.g] * self.t)
+            value = np.bincount(self.g, disc, self.n)
+            slope = np.bincount(self.g, -self.t * disc, self.n)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                step = np.where(done, 0.0, value / slope)
+            step = np.clip(np.nan_to_num(step, nan=0.0), -1.0, 1.0)  # 一步最多改變 e 倍，避免離解太遠時亂跳
+            x = np.clip(x - step, low, high)
+            done |= np.abs(step) < TOL
+        return x, done & todo & (x > low) & (x < high)  # 沒有要解的組 (~todo) 不算收斂，維持 NaN
+
+    def bisect(self, lo, hi, todo, width):
+        """把 todo 各組的解夾在 [lo, hi] 內，直到寬度小於 width。"""
+        f_lo = self.npv(lo)
+        for _ in range(BISECT_ITER):
+            if (hi - lo)[todo].max() < width: break
+            mid = (lo + hi) / 2
+            f_mid = self.npv(mid)
+            left = todo & (np.sign(f_mid) == np.sign(f_lo))
+            lo, f_lo = np.where(left, mid, lo), np.where(left, f_mid, f_lo)
+            hi = np.where(todo & ~left, mid, hi)
+        return lo, hi
+
+def solve(amounts, years, groups, n_groups):
+    """同時解 n_groups 組 Σ c·(1+r)^-t = 0；groups 為每筆現金流所屬的組別 (0 ~ n_groups-1)。
+
+    以 x = ln(1+r) 做牛頓法 (Σ c·e^(-x·t) 對 x 較平滑，虧損的持股也不會衝出定義域)；
+    少數沒收斂的組 (多半是短期大賠) 只取它們的現金流，先二分夾出小區間再做一次牛頓法，仍不行就二分到底。
+    回傳每組的年化報酬率 (小數)；沒有同時包含流入與流出、或範圍內無解的組為 NaN。
+    """
+    low, high = np.log1p(MIN_RATE), np.log1p(MAX_RATE)
+    has_in = np.bincount(groups, amounts > 0, n_groups) > 0
+    has_out = np.bincount(groups, amounts < 0, n_groups) > 0
+    active = has_in & has_out
+    x, ok = _Flows(amounts, years, groups, n_groups).newton(_guess(amounts, years, groups, n_groups), active, low, high)
+
+    todo = active & ~ok
+    if todo.any():
+        sel = todo[groups]
+        flows = _Flows(amounts[sel], years[sel], groups[sel], n_groups)
+        lo, hi = np.full(n_groups, low), np.full(n_groups, high)
+        todo &= np.sign(flows.npv(lo)) != np.sign(flows.npv(hi))
+        if todo.any():
+            lo, hi = flows.bisect(lo, hi, todo, BRACKET)
+            x2, ok2 = flows.newton((lo + hi) / 2, todo, lo, hi)
+            ok2 &= todo
+            rest = todo & ~ok2
+            if rest.any():
+                lo, hi = flows.bisect(lo, hi, rest, TOL)
+                x2 = np.where(rest, (lo + hi) / 2, x2)
+            x, ok = np.where(todo, x2, x), ok | todo
+    return np.where(ok, np.expm1(x), np.nan)
+
+def cash_flows(df_trans, df_div):
+    """交易與股利表 → (股票代號, 日期, 金額)：買入為流出 (負)，賣出與股利為流入 (正)，配股不計。
+
+    股息再投入的買入也算流出，對應的股利算流入，兩者相抵，等同把股利留在該檔持股裡。
+    """
+    parts = []
+    if df_trans is not None and not df_trans.empty and {"日期", "股票代號", "交易類別", "投入金額"} <= set(df_trans.columns):
+        sign = np.select([df_trans["交易類別"] == "買入", df_trans["交易類別"] == "賣出"], [-1.0, 1.0], 0.0)
+        parts.append(pd.DataFrame({"股票代號": df_trans["股票代號"].astype(str), "日期": df_trans["日期"],
+                                   "金額": sign * df_trans["投入金額"].to_numpy()})[sign != 0])
+    if df_div is not None and not df_div.empty and {"發放日期", "股票代號", "實領金額"} <= set(df_div.columns):
+        parts.append(pd.DataFrame({"股票代號": df_div["股票代號"].astype(str), "日期": df_div["發放日期"],
+                                   "金額": df_div["實領金額"]}))
+    if not parts:
+        return pd.DataFrame({"股票代號": pd.Series(dtype=object), "日期": pd.Series(dtype="datetime64[ns]"),
+                             "金額": pd.Series(dtype=float)})
+    flows = pd.concat(parts, ignore_index=True)
+    return flows[flows["日期"].notna() & (flows["金額"] != 0)]
+
+def holding_xirr(flows, codes, values, as_of):
+    """各持股 (codes 對應目前市值 values) 與整體投資組合的年化報酬率 (%)。
+
+    今天 (as_of) 的市值視為最後一筆流入；整體組合包含已出清股票的現金流。
+    同一代號出現多列時 (總表重複列出)，以各列市值合計一起解，每列拿到同一個值。
+    回傳 (與 codes 同順序的 ndarray, 整體組合的值)。
+    """
+    row_group, codes = pd.factorize(np.asarray(codes, dtype=object).astype(str))
+    codes = pd.Index(codes)
+    values = np.bincount(row_group, np.asarray(values, dtype=float), len(codes))
+    total = len(codes)  # 最後一組是整體組合
+    held = codes.get_indexer(flows["股票代號"])
+    keep = held >= 0
+
+    days = np.concatenate([flows["日期"].to_numpy("datetime64[D]").astype(np.int64)[keep],
+                           flows["日期"].to_numpy("datetime64[D]").astype(np.int64),
+                           np.full(total + 1, np.datetime64(as_of, "D").astype(np.int64))])
+    amounts = np.concatenate([flows["金額"].to_numpy(float)[keep], flows["金額"].to_numpy(float),
+                              np.append(values, values.sum())])
+    groups = np.concatenate([held[keep], np.full(len(flows), total), np.arange(total + 1)])
+
+    # 同一組同一天的現金流先加總 (結果不變)，牛頓法每輪要算的筆數少很多
+    first = days.min()
+    span = days.max() - first + 1
+    keys, pos = np.unique(groups * span + (days - first), return_inverse=True)
+    amounts = np.bincount(pos, amounts, len(keys))
+    groups, days = keys // span, keys % span
+    start = np.full(total + 1, np.iinfo(np.int64).max)
+    np.minimum.at(start, groups, days)
+    rates = solve(amounts, (days - start[groups]) / 365.0, groups, total + 1) * 100
+    return rates[row_group], rates[-1]